@@ -10,7 +10,7 @@ from gi.repository import GObject, Gtk, Notify
 from pkg_resources import resource_filename
 
 from weboob.capabilities import UserError
-from weboob.capabilities.bank import Account, CapBank
+from weboob.capabilities.bank import Account, CapBank, TransactionBatch
 from weboob.core import CallErrors, Weboob
 from weboob.exceptions import BrowserForbidden, BrowserIncorrectPassword, BrowserSSLError, BrowserUnavailable
 from weboob.tools.application.base import MoreResultsAvailable
@@ -38,10 +38,18 @@ class BoobankTransactionsChecker(Thread):
         self.menu = menu
         self.account = account
 
+    def iter_history(self, backend, account):
+        for tr in backend.iter_history(account):
+            if isinstance(tr, TransactionBatch):
+                for row in tr:
+                    yield row
+            else:
+                yield tr
+
     def run(self):
         account_history_menu = Gtk.Menu()
 
-        for tr in self.weboob.do('iter_history', self.account, backends=self.account.backend):
+        for tr in self.weboob.do(self.iter_history, self.account, backends=self.account.backend):
             label = u'%s - %s: %s%s' % (tr.date, tr.label, tr.amount, self.account.currency_text)
             image = "green_light.png" if tr.amount > 0 else "red_light.png"
             transaction_item = create_image_menu_item(label, image)
@@ -40,7 +40,9 @@ then
       err=1
   fi
   if [ ${err} -ne 1 ]; then
-    $PYTHON2 -m ${FLAKER2} ${OPT2} ${PYFILES} || err=32
+    # asyncio support is only available on Python 3
+    PYFILES2=$(echo ${PYFILES} | tr ' ' '\n' | grep -vE '^weboob/core/(abcall|tests/_abcall)\.py$')
+    $PYTHON2 -m ${FLAKER2} ${OPT2} ${PYFILES2} || err=32
   fi
 fi
 
@@ -35,7 +35,7 @@ from weboob.exceptions import (
 from weboob.core.bcall import CallErrors
 from weboob.capabilities.base import empty, find_object
 from weboob.capabilities.bank import (
-    Account, Transaction,
+    Account, Transaction, TransactionBatch,
     Transfer, TransferStep, Recipient, AddRecipientStep,
     CapBank, CapBankTransfer, CapBankWealth,
     TransferInvalidLabel, TransferInvalidAmount, TransferInvalidDate,
@@ -548,6 +548,23 @@ class Boobank(CaptchaMixin, ReplApplication):
         """
         return self.do_ls(line)
 
+    def _iter_history(self, backend, command, account, split=False):
+        # Results are counted and checked against the condition one by one,
+        # so batches are split into transactions when they are used, or when
+        # the caller only handles transactions.
+        transactions = getattr(backend, command)(account)
+        try:
+            for transaction in transactions:
+                if isinstance(transaction, TransactionBatch) and \
+                   (split or self.options.count is not None or self.condition):
+                    for row in transaction:
+                        yield row
+                else:
+                    yield transaction
+        finally:
+            if hasattr(transactions, 'close'):
+                transactions.close()
+
     def show_history(self, command, line):
         id, end_date = self.parse_command_args(line, 2, 1)
 
@@ -567,7 +584,18 @@ class Boobank(CaptchaMixin, ReplApplication):
             self.options.count = None
 
         self.start_format(account=account)
-        for transaction in self.do(command, account, backends=account.backend):
+        for transaction in self.do(self._iter_history, command, account, backends=account.backend):
+            if isinstance(transaction, TransactionBatch):
+                batch = transaction
+                if end_date is not None:
+                    dates = batch.columns['date']
+                    end = next((i for i, date in enumerate(dates) if date < end_date), len(dates))
+                    batch = batch[:end]
+                self.format(batch)
+                if len(batch) < len(transaction):
+                    break
+                continue
+
             if end_date is not None and transaction.date < end_date:
                 break
             self.format(transaction)
@@ -867,7 +895,7 @@ class Boobank(CaptchaMixin, ReplApplication):
                 account_id = accounts[account.id]['id']
 
             transactions = []
-            for tr in self.do('iter_history', account, backends=account.backend):
+            for tr in self.do(self._iter_history, 'iter_history', account, split=True, backends=account.backend):
                 transactions.append({'original_wording': tr.raw,
                                      'simplified_wording': tr.label,
                                      'value': tr.amount,
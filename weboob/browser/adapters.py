@@ -18,13 +18,70 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from email.message import Message
+from threading import Lock
+
 import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+__all__ = ['HTTPAdapter', 'HTTP2Adapter', 'TRANSPORTS', 'get_shared_adapter']
+
+
+_shared_adapters = {}
+_shared_adapters_lock = Lock()
 
 
-__all__ = ['HTTPAdapter']
+def get_shared_adapter(adapter_class, key, **kwargs):
+    """
+    Get an adapter instance shared by every session asking for the same
+    *adapter_class* and *key*, so they reuse the same keep-alive connections.
+
+    Cookies are stored by sessions, not adapters, so they are not shared.
+    Each session closing the adapter releases it, and the connections are
+    closed once it is not used anymore.
+
+    :param key: options the adapter is used with, like proxies and
+                certificates (must be hashable)
+    :param kwargs: arguments to build the adapter if it does not exist yet
+    """
+    with _shared_adapters_lock:
+        adapter = _shared_adapters.get((adapter_class, key))
+        if adapter is None:
+            adapter = adapter_class(**kwargs)
+            adapter._shared_key = (adapter_class, key)
+            _shared_adapters[adapter._shared_key] = adapter
+        adapter._shared_users += 1
+        return adapter
+
+
+def _release_adapter(adapter):
+    """
+    Returns True if the adapter can be closed, i.e. it is not shared by
+    another session.
+    """
+    if adapter._shared_key is None:
+        return True
+
+    with _shared_adapters_lock:
+        adapter._shared_users -= 1
+        if adapter._shared_users > 0:
+            return False
+        del _shared_adapters[adapter._shared_key]
+        adapter._shared_key = None
+        return True
 
 
 class HTTPAdapter(requests.adapters.HTTPAdapter):
+    _shared_key = None
+    _shared_users = 0
+
     def __init__(self, *args, **kwargs):
         self._proxy_headers = kwargs.pop('proxy_headers', {})
         super(HTTPAdapter, self).__init__(*args, **kwargs)
@@ -39,3 +96,179 @@ class HTTPAdapter(requests.adapters.HTTPAdapter):
         headers = super(HTTPAdapter, self).proxy_headers(proxy)
         headers.update(self._proxy_headers)
         return headers
+
+    def close(self):
+        if _release_adapter(self):
+            super(HTTPAdapter, self).close()
+
+
+class _HTTP2Raw(object):
+    """
+    Body of a response received by :class:`HTTP2Adapter`.
+
+    It reads the httpx response while it is consumed, and mimics the
+    urllib3 response enough for requests to stream it and to extract cookies
+    from it. The body is already decoded by httpx.
+    """
+
+    def __init__(self, resp, request):
+        msg = Message()
+        for key, value in resp.headers.multi_items():
+            msg[key] = value
+        self._original_response = self
+        self.msg = msg
+        self.headers = resp.headers
+        self._resp = resp
+        self._request = request
+        self._chunks = None
+        self._buffer = b''
+
+    def stream(self, chunk_size=None, decode_content=True):
+        try:
+            for chunk in self._resp.iter_bytes(chunk_size):
+                yield chunk
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=self._request)
+        finally:
+            self.close()
+
+    def read(self, amt=None, decode_content=True):
+        if self._chunks is None:
+            self._chunks = self.stream()
+        for chunk in self._chunks:
+            self._buffer += chunk
+            if amt is not None and len(self._buffer) >= amt:
+                break
+        if amt is None:
+            amt = len(self._buffer)
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def release_conn(self):
+        self.close()
+
+    def close(self):
+        self._resp.close()
+
+    @property
+    def closed(self):
+        return self._resp.is_closed
+
+
+class HTTP2Adapter(requests.adapters.BaseAdapter):
+    """
+    Transport adapter sending requests with HTTP/2 when the server supports
+    it, using `httpx <https://www.python-httpx.org/>`_.
+
+    Requests to the same origin are multiplexed on a single connection.
+    Redirects, cookies and hooks are still handled by the requests session.
+    """
+
+    _shared_key = None
+    _shared_users = 0
+
+    def __init__(self, pool_maxsize=requests.adapters.DEFAULT_POOLSIZE, proxy_headers=None, **kwargs):
+        if httpx is None:
+            raise ImportError('Please install python3-httpx and python3-h2 to use the HTTP/2 transport')
+
+        super(HTTP2Adapter, self).__init__()
+        self._proxy_headers = proxy_headers or {}
+        self._pool_maxsize = pool_maxsize
+        self._clients = {}
+        self._clients_lock = Lock()
+
+    def add_proxy_header(self, key, value):
+        self._proxy_headers[key] = value
+        self._close_clients()
+
+    def update_proxy_headers(self, headers):
+        self._proxy_headers.update(headers)
+        self._close_clients()
+
+    def get_client(self, proxy, verify, cert):
+        """
+        Get the httpx client to use, one per set of connection options.
+        """
+        key = (proxy, verify, cert)
+        with self._clients_lock:
+            if key not in self._clients:
+                kwargs = dict(http2=True,
+                              verify=verify,
+                              cert=cert,
+                              limits=httpx.Limits(max_connections=self._pool_maxsize))
+                if proxy:
+                    kwargs['proxy'] = httpx.Proxy(proxy, headers=self._proxy_headers)
+                self._clients[key] = httpx.Client(**kwargs)
+            return self._clients[key]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+
+        client = self.get_client(select_proxy(request.url, proxies or {}), verify, cert)
+        try:
+            req = client.build_request(request.method, request.url,
+                                       headers=list(request.headers.items()),
+                                       content=request.body,
+                                       timeout=timeout)
+            resp = client.send(req, stream=True, follow_redirects=False)
+            if not stream:
+                try:
+                    resp.read()
+                finally:
+                    resp.close()
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except httpx.ProxyError as e:
+            raise requests.exceptions.ProxyError(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        response = self.build_response(request, resp)
+        if not stream:
+            response._content = resp.content
+            response._content_consumed = True
+        return response
+
+    def build_response(self, req, resp):
+        response = requests.Response()
+        response.status_code = resp.status_code
+        response.headers = CaseInsensitiveDict(resp.headers.items())
+        if 'Content-Encoding' in response.headers:
+            # httpx decodes the body, so these headers do not describe it.
+            del response.headers['Content-Encoding']
+            response.headers.pop('Content-Length', None)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = resp.reason_phrase
+        response.url = req.url
+        response.request = req
+        response.connection = self
+        response.raw = _HTTP2Raw(resp, req)
+
+        requests.cookies.extract_cookies_to_jar(response.cookies, req, response.raw)
+        return response
+
+    def close(self):
+        if not _release_adapter(self):
+            return
+
+        self._close_clients()
+
+    def _close_clients(self):
+        with self._clients_lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+
+TRANSPORTS = {
+    'http1': HTTPAdapter,
+    'h2': HTTP2Adapter,
+}
+"""
+Transport adapters which can be selected with :attr:`Browser.TRANSPORT
+<weboob.browser.browsers.Browser.TRANSPORT>`.
+"""
@@ -20,7 +20,7 @@
 from __future__ import absolute_import, print_function
 
 from collections import OrderedDict
-from functools import wraps
+from functools import partial, wraps
 import re
 import pickle
 import base64
@@ -52,17 +52,18 @@ from weboob.exceptions import (
 )
 
 from weboob.tools.log import getLogger
+from weboob.tools.misc import get_time_left
 from weboob.tools.compat import basestring, unicode, urlparse, urljoin, urlencode, parse_qsl
 from weboob.tools.json import json
 from weboob.tools.value import Value
 
-from .adapters import HTTPAdapter
+from .adapters import TRANSPORTS, get_shared_adapter
 from .cookies import WeboobCookieJar
 from .exceptions import HTTPNotFound, ClientError, ServerError
 from .sessions import FuturesSession
 from .profiles import Firefox
 from .pages import NextPage
-from .url import URL, normalize_url
+from .url import URL, URLRouter, normalize_url
 
 
 class Browser(object):
@@ -102,6 +103,20 @@ class Browser(object):
     Maximum of threads for asynchronous requests.
     """
 
+    TRANSPORT = 'http1'
+    """
+    Transport used to send requests, a key of
+    :data:`weboob.browser.adapters.TRANSPORTS`: 'http1' (urllib3), or 'h2'
+    to multiplex requests to a host on one HTTP/2 connection (requires httpx).
+    """
+
+    SHARE_CONNECTIONS = False
+    """
+    Share connection pools with the other browsers of the process using the
+    same transport, proxies and certificates options, so keep-alive
+    connections to a host are reused between them. Cookies are not shared.
+    """
+
     ALLOW_REFERRER = True
     """
     Controls the behavior of get_referrer.
@@ -238,8 +253,21 @@ class Browser(object):
         if self.MAX_WORKERS > requests.adapters.DEFAULT_POOLSIZE:
             adapter_kwargs.update(pool_connections=self.MAX_WORKERS,
                                   pool_maxsize=self.MAX_WORKERS)
-        session.mount('https://', HTTPAdapter(**adapter_kwargs))
-        session.mount('http://', HTTPAdapter(**adapter_kwargs))
+        adapter_class = TRANSPORTS[self.TRANSPORT]
+        if self.SHARE_CONNECTIONS:
+            key = (frozenset((self.PROXIES or {}).items()),
+                   frozenset(self.proxy_headers.items()),
+                   session.verify,
+                   session.cert,
+                   self.MAX_RETRIES,
+                   adapter_kwargs.get('pool_maxsize'))
+            # The adapter is released by each mount point when the session
+            # is closed.
+            session.mount('https://', get_shared_adapter(adapter_class, key, **adapter_kwargs))
+            session.mount('http://', get_shared_adapter(adapter_class, key, **adapter_kwargs))
+        else:
+            session.mount('https://', adapter_class(**adapter_kwargs))
+            session.mount('http://', adapter_class(**adapter_kwargs))
 
         if self.TIMEOUT:
             session.timeout = self.TIMEOUT
@@ -361,6 +389,16 @@ class Browser(object):
         if timeout is None:
             timeout = self.TIMEOUT
 
+        time_left = get_time_left()
+        if time_left is not None:
+            # Do not wait past the deadline of the current call.
+            if time_left == 0:
+                raise requests.exceptions.Timeout('Deadline reached before requesting %s' % preq.url, request=preq)
+            if isinstance(timeout, tuple):
+                timeout = tuple(time_left if t is None else min(t, time_left) for t in timeout)
+            elif timeout is None or timeout > time_left:
+                timeout = time_left
+
         # We define an inner_callback here in order to execute the same code
         # regardless of is_async param.
         def inner_callback(future, response):
@@ -392,6 +430,22 @@ class Browser(object):
             del kwargs['is_async']
         return self.open(url, is_async=True, **kwargs)
 
+    def aopen(self, url, **kwargs):
+        """
+        Like :meth:`async_open`, but returns an :mod:`asyncio` future bound to
+        the current event loop, which can be awaited by a coroutine:
+
+        >>> response = await browser.aopen('http://google.com') # doctest: +SKIP
+
+        The request is still processed by the session's thread pool (see
+        :attr:`MAX_WORKERS`).
+
+        :rtype: :class:`asyncio.Future`
+        """
+        import asyncio
+
+        return asyncio.wrap_future(self.async_open(url, **kwargs))
+
     def raise_for_status(self, response):
         """
         Like Response.raise_for_status but will use other classes if needed.
@@ -673,11 +727,19 @@ class PagesBrowser(DomainBrowser):
 
     _urls = None
 
+    PREFETCH_MAX = 50
+    """
+    Maximum number of prefetched responses waiting to be used, see
+    :meth:`prefetch`. Past that, the oldest ones are dropped.
+    """
+
     def __init__(self, *args, **kwargs):
         self.highlight_el = kwargs.pop('highlight_el', False)
         super(PagesBrowser, self).__init__(*args, **kwargs)
 
         self.page = None
+        self._prefetched = OrderedDict()
+        self._prefetched_lock = Lock()
 
         # exclude properties because they can access other fields not yet defined
         def is_property(attr):
@@ -704,38 +766,138 @@ class PagesBrowser(DomainBrowser):
         callback = kwargs.pop('callback', lambda response: response)
         page_class = kwargs.pop('page', None)
 
+        if self._prefetched and not page_class:
+            key = self._get_prefetch_key(*args, **kwargs)
+            with self._prefetched_lock:
+                future = self._prefetched.pop(key, None)
+            if future is not None:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    self.logger.debug('Prefetching %s has failed (%r), fetch it again', key, e)
+                else:
+                    self.logger.debug('Use prefetched response for %s', key)
+                    return callback(response)
+
         # Have to define a callback to seamlessly process synchronous and
         # asynchronous requests, see :meth:`Browser.open` and its `is_async`
         # and `callback` params.
         def internal_callback(response):
-            # Try to handle the response page with an URL instance.
-            response.page = None
-            if page_class:
-                response.page = page_class(self, response)
-                return callback(response)
-
-            for url in self._urls.values():
-                response.page = url.handle(response)
-                if response.page is not None:
-                    self.logger.debug('Handle %s with %s', response.url, response.page.__class__.__name__)
-                    break
-
-            if response.page is None:
-                regexp = r'^(?P<proto>\w+)://.*'
-
-                proto_response = re.match(regexp, response.url)
-                if proto_response and self.BASEURL:
-                    proto_response = proto_response.group('proto')
-                    proto_base = re.match(regexp, self.BASEURL).group('proto')
+            self.handle_page(response, page_class)
+            return callback(response)
 
-                    if proto_base == 'https' and proto_response != 'https':
-                        raise BrowserHTTPSDowngrade()
+        return super(PagesBrowser, self).open(callback=internal_callback, *args, **kwargs)
 
-                self.logger.debug('Unable to handle %s', response.url)
+    def handle_page(self, response, page_class=None):
+        """
+        Called by open, to set the `page` attribute of the response, with the
+        page of the first :class:`URL` object matching it, or `page_class` if
+        given.
+        """
+        # Try to handle the response page with an URL instance.
+        response.page = None
+        if page_class:
+            response.page = page_class(self, response)
+            return
 
-            return callback(response)
+        if response.request.method != 'HEAD':
+            # Pages built for this response share their document when they
+            # parse it the same way, see Page.get_doc_key.
+            response._shared_docs = {}
+            try:
+                router = URLRouter.get(self._urls, self.BASEURL)
+                for name in router.iter_candidates(response.url):
+                    url = self._urls[name]
+                    m = url.match(response.url)
+                    if m is None:
+                        continue
+                    response.page = url.build_page(response, m)
+                    if response.page is not None:
+                        self.logger.debug('Handle %s with %s', response.url, response.page.__class__.__name__)
+                        break
+            finally:
+                del response._shared_docs
+
+        if response.page is None:
+            regexp = r'^(?P<proto>\w+)://.*'
+
+            proto_response = re.match(regexp, response.url)
+            if proto_response and self.BASEURL:
+                proto_response = proto_response.group('proto')
+                proto_base = re.match(regexp, self.BASEURL).group('proto')
+
+                if proto_base == 'https' and proto_response != 'https':
+                    raise BrowserHTTPSDowngrade()
+
+            self.logger.debug('Unable to handle %s', response.url)
+
+    def prefetch(self, urls):
+        """
+        Start to fetch several urls in parallel, so that a later :meth:`open`
+        or :meth:`location` on one of them (for example through
+        :meth:`URL.go <weboob.browser.url.URL.go>` or
+        :meth:`URL.stay_or_go <weboob.browser.url.URL.stay_or_go>`) reuses
+        the response and its already parsed page instead of doing the
+        request again.
+
+        Only simple GET requests are reused, and each prefetched response is
+        used once. At most :attr:`PREFETCH_MAX` responses are kept until they
+        are used, and failed ones are fetched again when they are needed.
+
+        >>> browser.prefetch([browser.card.build(id=card.id) for card in cards]) # doctest: +SKIP
+        >>> for card in cards: # doctest: +SKIP
+        ...     browser.card.go(id=card.id).fill_card(obj=card)
+
+        :param urls: urls to fetch
+        :type urls: list[str]
+        :returns: Future objects, as returned by :meth:`open` with `is_async`
+        :rtype: list
+        """
+        futures = []
+        for url in urls:
+            key = self._get_prefetch_key(url)
+            if key is None:
+                futures.append(self.open(url, is_async=True))
+                continue
+            with self._prefetched_lock:
+                future = self._prefetched.get(key)
+            if future is None:
+                future = self.open(url, is_async=True)
+                with self._prefetched_lock:
+                    self._prefetched[key] = future
+                    dropped = []
+                    while len(self._prefetched) > self.PREFETCH_MAX:
+                        dropped.append(self._prefetched.popitem(last=False)[1])
+                # Callbacks of a cancelled future are run at once, and they
+                # take the lock.
+                for old_future in dropped:
+                    old_future.cancel()
+                future.add_done_callback(partial(self._prefetch_done, key))
+            futures.append(future)
+        return futures
+
+    def _prefetch_done(self, key, future):
+        # Do not keep failed responses, they will be fetched again if needed.
+        if future.cancelled() or future.exception() is not None:
+            with self._prefetched_lock:
+                if self._prefetched.get(key) is future:
+                    del self._prefetched[key]
 
-        return super(PagesBrowser, self).open(callback=internal_callback, *args, **kwargs)
+    def deinit(self):
+        with self._prefetched_lock:
+            futures = list(self._prefetched.values())
+            self._prefetched.clear()
+        for future in futures:
+            future.cancel()
+        super(PagesBrowser, self).deinit()
+
+    def _get_prefetch_key(self, url, params=None, data=None, json=None, method=None, headers=None, is_async=False, **kwargs):
+        # Requests which are not simple GET ones are never matched with a
+        # prefetched response.
+        if (is_async or params or data is not None or json is not None or headers or kwargs
+                or method not in (None, 'GET') or not isinstance(url, basestring)):
+            return None
+        return self.absurl(url)
 
     def location(self, *args, **kwargs):
         """
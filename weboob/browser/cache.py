@@ -17,14 +17,112 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-__all__ = ['CacheMixin']
+from email.utils import mktime_tz, parsedate_tz
+from hashlib import sha256
+from threading import Lock
+from time import time
+import re
+import sqlite3
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from weboob.tools.compat import unicode
+from weboob.tools.json import json
+from weboob.tools.lrudict import LimitedLRUDict
+
+__all__ = ['CacheMixin', 'MemoryCache', 'SQLiteCache']
 
 
 class CacheEntry(object):
-    def __init__(self, response):
-        self.response = response
-        self.etag = response.headers.get('ETag')
-        self.last_modified = response.headers.get('Last-Modified')
+    """
+    Response stored in a cache.
+
+    Only the data needed to rebuild the response is kept, so that entries can
+    be stored out of the process.
+    """
+
+    REQUIRED_HEADERS = ('cache-control', 'content-type', 'etag', 'expires', 'last-modified')
+    """
+    Headers always kept, as they are needed to use the entry.
+    """
+
+    def __init__(self, response=None, headers=None):
+        """
+        :param response: response to store
+        :type response: :class:`requests.Response`
+        :param headers: names of the response headers to keep in addition
+                        to :attr:`REQUIRED_HEADERS`, or None to keep them all
+        :type headers: list
+        """
+        self.status_code = None
+        self.reason = None
+        self.url = None
+        self.headers = []
+        self.content = b''
+        self.stored_at = time()
+
+        if response is not None:
+            self.status_code = response.status_code
+            self.reason = response.reason
+            self.url = response.url
+            self.headers = list(response.headers.items())
+            if headers is not None:
+                names = set(self.REQUIRED_HEADERS) | set(name.lower() for name in headers)
+                self.headers = [(key, value) for key, value in self.headers if key.lower() in names]
+            self.content = response.content
+
+    @property
+    def size(self):
+        """
+        Approximate number of bytes used by the entry.
+        """
+        return len(self.content) + sum(len(key) + len(value) for key, value in self.headers)
+
+    @property
+    def etag(self):
+        return self.get_header('ETag')
+
+    @property
+    def last_modified(self):
+        return self.get_header('Last-Modified')
+
+    def get_header(self, name):
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+
+    @property
+    def expires(self):
+        """
+        Timestamp until which the response can be used without asking the
+        server, according to `Cache-Control` and `Expires` headers.
+        """
+        cache_control = self.get_header('Cache-Control') or ''
+        if re.search(r'\b(no-cache|no-store|must-revalidate)\b', cache_control):
+            return None
+
+        m = re.search(r'\bmax-age\s*=\s*"?(\d+)', cache_control)
+        if m:
+            return self.stored_at + int(m.group(1))
+
+        expires = self.get_header('Expires')
+        if expires:
+            date = parsedate_tz(expires)
+            # An invalid date, like "0", means already expired.
+            return mktime_tz(date) if date else None
+
+    def is_fresh(self):
+        expires = self.expires
+        return expires is not None and time() < expires
+
+    def is_storable(self):
+        cache_control = self.get_header('Cache-Control') or ''
+        if re.search(r'\bno-store\b', cache_control):
+            return False
+        return bool(self.has_cache_key() or self.is_fresh())
 
     def has_cache_key(self):
         return (self.etag or self.last_modified)
@@ -35,19 +133,210 @@ class CacheEntry(object):
         if self.etag:
             request.headers['If-None-Match'] = self.etag
 
+    def refresh(self, response):
+        """
+        Update the entry with the headers of a 304 response.
+        """
+        headers = CaseInsensitiveDict(self.headers)
+        headers.update(response.headers)
+        self.headers = list(headers.items())
+        self.stored_at = time()
+
+    def make_response(self, request):
+        """
+        Build a new :class:`requests.Response` object from this entry.
+        """
+        response = Response()
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.request = request
+        response._content = self.content
+        response._content_consumed = True
+        return response
+
+
+class MemoryCache(LimitedLRUDict):
+    """
+    Cache store kept in memory, limited in number of entries and in total
+    size of entries.
+
+    When a limit is exceeded, the least recently used entries are removed.
+    """
+
+    max_entries = 1000
+    max_size = 32 * 1024 * 1024
+
+    def __init__(self, max_entries=None, max_size=None):
+        super(MemoryCache, self).__init__()
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_size is not None:
+            self.max_size = max_size
+        self.size = 0
+
+    def __setitem__(self, key, entry):
+        super(MemoryCache, self).__setitem__(key, entry)
+        self.size += entry.size
+        while self.size > self.max_size and len(self):
+            self.popitem(last=False)
+
+    def __delitem__(self, key):
+        self.size -= super(MemoryCache, self).pop(key).size
+
+    def popitem(self, last=True):
+        key, entry = super(MemoryCache, self).popitem(last=last)
+        self.size -= entry.size
+        return key, entry
+
+    def clear(self):
+        super(MemoryCache, self).clear()
+        self.size = 0
+
+
+class SQLiteCache(object):
+    """
+    Cache store saved in a SQLite database, to keep responses between runs.
+
+    The database can be shared by several processes. When the total size of
+    stored bodies exceeds `max_size` bytes, the least recently used entries
+    are removed.
+
+    >>> browser.cache = SQLiteCache('/tmp/weboob-cache.sqlite') # doctest: +SKIP
+    """
+
+    def __init__(self, path, max_size=100 * 1024 * 1024, timeout=30):
+        self.path = path
+        self.max_size = max_size
+        self.lock = Lock()
+        self.storage = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.storage.execute('PRAGMA journal_mode = WAL')
+        self.storage.execute('''CREATE TABLE IF NOT EXISTS cache (
+            key text PRIMARY KEY,
+            status integer,
+            reason text,
+            url text,
+            headers text,
+            content blob,
+            size integer,
+            stored_at real,
+            accessed_at real
+        );''')
+        self.storage.execute('CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);')
+
+    def make_key(self, key):
+        return sha256(repr(key).encode('utf-8')).hexdigest()
+
+    def __contains__(self, key):
+        with self.lock:
+            cur = self.storage.execute('SELECT 1 FROM cache WHERE key=?;', (self.make_key(key),))
+            return cur.fetchone() is not None
+
+    def __getitem__(self, key):
+        key = self.make_key(key)
+        with self.lock:
+            cur = self.storage.execute('SELECT status, reason, url, headers, content, stored_at FROM cache WHERE key=?;', (key,))
+            row = cur.fetchone()
+            if row is None:
+                raise KeyError(key)
+            self.storage.execute('UPDATE cache SET accessed_at=? WHERE key=?;', (time(), key))
+
+        entry = CacheEntry()
+        entry.status_code, entry.reason, entry.url, headers, content, entry.stored_at = row
+        entry.headers = [tuple(header) for header in json.loads(headers)]
+        entry.content = bytes(content)
+        return entry
+
+    def __setitem__(self, key, entry):
+        key = self.make_key(key)
+        size = len(entry.content)
+        with self.lock:
+            self.storage.execute('BEGIN IMMEDIATE;')
+            try:
+                self.storage.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);',
+                                     (key, entry.status_code, entry.reason, entry.url, json.dumps(entry.headers),
+                                      sqlite3.Binary(entry.content), size, entry.stored_at, time()))
+                self._evict()
+            except BaseException:
+                self.storage.execute('ROLLBACK;')
+                raise
+            else:
+                self.storage.execute('COMMIT;')
+
+    def __delitem__(self, key):
+        with self.lock:
+            cur = self.storage.execute('DELETE FROM cache WHERE key=?;', (self.make_key(key),))
+            if not cur.rowcount:
+                raise KeyError(key)
+
+    def __len__(self):
+        with self.lock:
+            return self.storage.execute('SELECT count(*) FROM cache;').fetchone()[0]
+
+    def _evict(self):
+        total, = self.storage.execute('SELECT COALESCE(SUM(size), 0) FROM cache;').fetchone()
+        if total <= self.max_size:
+            return
+
+        cur = self.storage.execute('SELECT key, size FROM cache ORDER BY accessed_at;')
+        to_delete = []
+        for key, size in cur.fetchall():
+            if total <= self.max_size:
+                break
+            to_delete.append((key,))
+            total -= size
+        self.storage.executemany('DELETE FROM cache WHERE key=?;', to_delete)
+
+    def clear(self):
+        with self.lock:
+            self.storage.execute('DELETE FROM cache;')
+
+    def close(self):
+        with self.lock:
+            self.storage.close()
+
 
 class CacheMixin(object):
     """Mixin to inherit in a Browser"""
 
+    CACHE_KEY_HEADERS = ('Accept', 'Accept-Language', 'Authorization', 'Content-Type')
+    """
+    Request headers which are part of the cache key. Other headers, like
+    `Referer`, do not prevent to use a cached response. None to use all
+    headers.
+
+    Cookies are handled by :attr:`CACHE_KEY_COOKIES`, unless `Cookie` is
+    added here.
+    """
+
+    CACHE_KEY_COOKIES = ()
+    """
+    Names of the cookies which are part of the cache key, so that changing
+    tracking cookies do not prevent to use a cached response.
+
+    When responses depend on the user, add the session cookies, so that a
+    store shared by several sessions, like a :class:`SQLiteCache`, never
+    gives the page of a user to another one.
+    """
+
+    CACHE_RESPONSE_HEADERS = None
+    """
+    Response headers to keep in cache entries, in addition to those needed
+    by the cache itself. None to keep all headers.
+    """
+
     def __init__(self, *args, **kwargs):
         super(CacheMixin, self).__init__(*args, **kwargs)
 
-        self.cache = {}
+        self.cache = MemoryCache()
 
         """Cache store object
 
-        To limit the size of the cache, a :class:`weboob.tools.lrudict.LimitedLRUDict`
-        instance can be used.
+        By default, a :class:`MemoryCache` instance, limited in number and
+        size of entries. To keep the cache between runs, use a
+        :class:`SQLiteCache` instance. Any dict can also be used.
         """
 
         self.is_updatable = True
@@ -60,39 +349,88 @@ class CacheMixin(object):
         If `True`, the `ETag` and `Last-Modified` of the response will be
         stored along with the cache. When the request is re-executed, instead
         of simply returning the previous response, the server is queried to
-        check if a newer version of the page exists.
+        check if a newer version of the page exists, unless `Cache-Control` or
+        `Expires` headers tell that the response is still fresh.
         If a newer page exists, it is returned instead and overwrites the
         obsolete page in the cache.
         """
 
     def make_cache_key(self, request):
-        """Make a key for the cache corresponding to the request."""
+        """Make a key for the cache corresponding to the prepared request."""
+
+        if hasattr(request, 'body'):
+            body = request.body
+        elif request.data or request.json is not None:
+            body = (request.data, request.json)
+        else:
+            body = None
+        if body is not None:
+            if not isinstance(body, (bytes, unicode)):
+                body = repr(body)
+            if isinstance(body, unicode):
+                body = body.encode('utf-8')
+            body = sha256(body).hexdigest()
 
-        body = getattr(request, 'body', None)
-        headers = tuple(request.headers.values())
-        return (request.method, request.url, body, headers)
+        request_headers = CaseInsensitiveDict(request.headers)
+        if self.CACHE_KEY_HEADERS is None:
+            headers = tuple(sorted(request_headers.lower_items()))
+        else:
+            headers = tuple((name, request_headers.get(name)) for name in self.CACHE_KEY_HEADERS)
+
+        cookies = ()
+        if self.CACHE_KEY_COOKIES:
+            values = {}
+            for cookie in (request_headers.get('Cookie') or '').split(';'):
+                name, _, value = cookie.strip().partition('=')
+                values[name] = value
+            cookies = tuple((name, values.get(name)) for name in self.CACHE_KEY_COOKIES)
+        return (request.method, request.url, body, headers, cookies)
 
     def open_with_cache(self, url, **kwargs):
         """Perform a request using the cache if possible."""
         request = self.build_request(url, **kwargs)
+        if hasattr(self, 'absurl'):
+            # Like DomainBrowser.open()
+            request.url = self.absurl(request.url)
 
-        key = self.make_cache_key(request)
-        if key in self.cache:
-            if not self.is_updatable:
+        # The prepared request has the query parameters in its url, and the
+        # session headers and cookies.
+        preq = self.prepare_request(request)
+        key = self.make_cache_key(preq)
+        try:
+            entry = self.cache[key]
+        except KeyError:
+            entry = None
+        else:
+            if not self.is_updatable or entry.is_fresh():
                 self.logger.debug('cache HIT for %r', request.url)
-                return self.cache[key].response
+                return self.make_cached_response(entry, preq)
             else:
-                self.cache[key].update_request(request)
+                entry.update_request(request)
 
         response = super(CacheMixin, self).open(request, **kwargs)
-        if response.status_code == 304:
+        if response.status_code == 304 and entry is not None:
             self.logger.debug('cache HIT for %r', request.url)
-            return self.cache[key].response
+            entry.refresh(response)
+            self.cache[key] = entry
+            return self.make_cached_response(entry, response.request)
         elif response.status_code == 200:
-            entry = CacheEntry(response)
-            if entry.has_cache_key():
+            entry = CacheEntry(response, self.CACHE_RESPONSE_HEADERS)
+            if entry.is_storable():
                 self.logger.debug('storing %r response in cache', request.url)
                 self.cache[key] = entry
 
         self.logger.debug('cache MISS for %r', request.url)
         return response
+
+    def make_cached_response(self, entry, request):
+        """
+        Build the response of a cache entry.
+
+        Like :meth:`weboob.browser.browsers.PagesBrowser.open`, its `page`
+        attribute is set on pages browsers.
+        """
+        response = entry.make_response(request)
+        if hasattr(self, 'handle_page'):
+            self.handle_page(response)
+        return response
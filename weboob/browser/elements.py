@@ -19,25 +19,29 @@
 
 from __future__ import print_function
 
+import datetime
 import os
 import re
 import sys
 from collections import OrderedDict
 from copy import deepcopy
+from decimal import Decimal
 import traceback
 
 import lxml.html
 
 from weboob.tools.log import getLogger, DEBUG_FILTERS
-from weboob.tools.compat import basestring, unicode, with_metaclass
-from weboob.browser.pages import NextPage
-from weboob.capabilities.base import FetchError
+from weboob.tools.compat import MutableMapping, basestring, long, unicode, with_metaclass
+from weboob.browser.pages import CsvDocument, NextPage, StreamingPage
+from weboob.capabilities.base import EmptyType, FetchError
 
 from .filters.standard import _Filter, CleanText
 from .filters.html import AttributeNotFound, XPathNotFound
+from .filters.base import select_xpath
 
 
-__all__ = ['DataError', 'AbstractElement', 'ListElement', 'ItemElement', 'TableElement', 'SkipItem']
+__all__ = ['DataError', 'AbstractElement', 'ListElement', 'ItemElement', 'TableElement', 'SkipItem',
+           'ElementEnv']
 
 
 def generate_table_element(doc, head_xpath, cleaner=CleanText):
@@ -81,6 +85,105 @@ class DataError(Exception):
     """
 
 
+_debug_logger = getLogger('b2filters')
+
+_IMMUTABLE_TYPES = (type(None), bool, int, long, float, complex, Decimal, basestring, bytes,
+                    datetime.date, datetime.time, datetime.timedelta, EmptyType, type)
+
+
+def is_immutable(value):
+    """
+    Whether a value can be shared instead of being copied.
+
+    >>> is_immutable((1, u'a', datetime.date(2020, 1, 1)))
+    True
+    >>> is_immutable((1, []))
+    False
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return True
+    if type(value) in (tuple, frozenset):
+        return all(is_immutable(item) for item in value)
+    return False
+
+
+_DELETED = object()
+
+
+class ElementEnv(MutableMapping):
+    """
+    Environment of an element, read by :class:`weboob.browser.filters.standard.Env`.
+
+    It behaves like a copy of the environment of the parent element, but
+    keys are only stored when they are set, and mutable values are copied
+    the first time they are read. The parent environment is copied on write,
+    if it is changed after its children are created.
+    """
+
+    def __init__(self, parent=None, params=None):
+        """
+        :param parent: environment of the parent element
+        :type parent: :class:`ElementEnv`
+        :param params: parameters of the page, used when there is no parent
+        :type params: :class:`dict`
+        """
+        if parent is not None:
+            parent._shared = True
+            self._maps = [{}] + parent._maps
+        else:
+            self._maps = [{}, dict(params)] if params else [{}]
+        self._shared = False
+
+    def _own(self):
+        if self._shared:
+            self._maps[0] = dict(self._maps[0])
+            self._shared = False
+        return self._maps[0]
+
+    def __getitem__(self, key):
+        for i, values in enumerate(self._maps):
+            if key in values:
+                value = values[key]
+                break
+        else:
+            raise KeyError(key)
+
+        if value is _DELETED:
+            raise KeyError(key)
+        if i > 0 and not is_immutable(value):
+            value = self._own()[key] = deepcopy(value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._own()[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._own()[key] = _DELETED
+
+    def __contains__(self, key):
+        for values in self._maps:
+            if key in values:
+                return values[key] is not _DELETED
+        return False
+
+    def __iter__(self):
+        seen = set()
+        for values in self._maps:
+            for key, value in values.items():
+                if key not in seen:
+                    seen.add(key)
+                    if value is not _DELETED:
+                        yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict(self.items()))
+
+
 def method(klass):
     """
     Class-decorator to call it as a method.
@@ -93,8 +196,30 @@ def method(klass):
     return inner
 
 
-class AbstractElement(object):
+class _ElementMeta(type):
+    """
+    Private meta-class used to invalidate what :meth:`AbstractElement._introspect`
+    found on element classes when one of them is modified.
+    """
+    generation = 0
+
+    # Attributes changed without changing what is introspected, the
+    # counter is incremented for every new element.
+    _untracked = ('_introspection', '_creation_counter')
+
+    def __setattr__(cls, name, value):
+        super(_ElementMeta, cls).__setattr__(name, value)
+        if name not in _ElementMeta._untracked:
+            _ElementMeta.generation += 1
+
+    def __delattr__(cls, name):
+        super(_ElementMeta, cls).__delattr__(name)
+        _ElementMeta.generation += 1
+
+
+class AbstractElement(with_metaclass(_ElementMeta, object)):
     _creation_counter = 0
+    _introspection = None
     condition = None
 
     def __init__(self, page, parent=None, el=None):
@@ -131,6 +256,8 @@ class AbstractElement(object):
             value = list(func(self.page, self, self.el)())
         elif callable(func):
             value = func()
+        elif is_immutable(func):
+            value = func
         else:
             value = deepcopy(func)
 
@@ -145,12 +272,32 @@ class AbstractElement(object):
     def xpath(self, *args, **kwargs):
         return self.el.xpath(*args, **kwargs)
 
+    @classmethod
+    def _introspect(cls):
+        """
+        Find the nested elements, loaders and columns of the class.
+
+        It is done once per class instead of for each parsed node, and
+        done again only if an element class is modified.
+        """
+        generation, attrs = cls.__dict__.get('_introspection') or (None, None)
+        if generation != _ElementMeta.generation:
+            generation = _ElementMeta.generation
+            attrs = {'elements': [], 'loaders': [], 'columns': []}
+            for attrname in dir(cls):
+                if attrname.startswith('load_'):
+                    attrs['loaders'].append((attrname[len('load_'):], attrname))
+                elif attrname.startswith('col_'):
+                    attrs['columns'].append((attrname[len('col_'):], attrname))
+
+                attr = getattr(cls, attrname, None)
+                if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr is not cls:
+                    attrs['elements'].append(attr)
+            cls._introspection = (generation, attrs)
+        return attrs
+
     def handle_loaders(self):
-        for attrname in dir(self):
-            m = re.match('load_(.*)', attrname)
-            if not m:
-                continue
-            name = m.group(1)
+        for name, attrname in self._introspect()['loaders']:
             if name in self.loaders:
                 continue
             loader = getattr(self, attrname)
@@ -158,9 +305,9 @@ class AbstractElement(object):
 
     def fill_env(self, page, parent=None):
         if parent is not None:
-            self.env = deepcopy(parent.env)
+            self.env = ElementEnv(parent.env)
         else:
-            self.env = deepcopy(page.params)
+            self.env = ElementEnv(params=page.params)
 
 
 class ListElement(AbstractElement):
@@ -186,39 +333,55 @@ class ListElement(AbstractElement):
         sufficient.
         """
         if self.item_xpath is not None:
-            element_list = self.el.xpath(self.item_xpath)
-            if element_list:
-                for el in element_list:
-                    yield el
-            elif self.empty_xpath is not None and not self.el.xpath(self.empty_xpath):
+            if self.is_streaming():
+                element_list = self.page.iter_xpath(self.item_xpath)
+            else:
+                element_list = select_xpath(self.el, self.item_xpath)
+            found = False
+            for el in element_list:
+                found = True
+                yield el
+            if not found and self.empty_xpath is not None and not select_xpath(self.el, self.empty_xpath):
                 # Send a warning if no item_xpath node was found and an empty_xpath is defined
                 self.logger.warning('No element matched the item_xpath and the defined empty_xpath was not found!')
         else:
             yield self.el
 
+    def is_streaming(self):
+        """
+        Whether elements are found while the document is parsed, see
+        :class:`weboob.browser.pages.StreamingPage`.
+        """
+        return isinstance(self.page, StreamingPage) and self.el is self.page.doc
+
     def __iter__(self):
         if self.condition is not None and not self.condition():
             return
 
         self.parse(self.el)
 
+        # Nodes of a streaming page are cleared once found, and rows of a
+        # lazy CSV document are not kept, so items are handled without
+        # waiting for the next ones.
+        streaming = self.is_streaming() or isinstance(self.el, CsvDocument)
+        elements = self._introspect()['elements']
         items = []
         for el in self.find_elements():
-            for attrname in dir(self):
-                attr = getattr(self, attrname)
-                if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != type(self):
-                    item = attr(self.page, self, el)
-                    if item.condition is not None and not item.condition():
-                        continue
+            for attr in elements:
+                item = attr(self.page, self, el)
+                if item.condition is not None and not item.condition():
+                    continue
 
-                    item.handle_loaders()
-                    items.append(item)
+                item.handle_loaders()
+                items.append(item)
 
-        for item in items:
-            for obj in item:
-                obj = self.store(obj)
-                if obj and not self.flush_at_end:
+            if streaming:
+                for obj in self.handle_items(items):
                     yield obj
+                items = []
+
+        for obj in self.handle_items(items):
+            yield obj
 
         if self.flush_at_end:
             for obj in self.flush():
@@ -226,6 +389,13 @@ class ListElement(AbstractElement):
 
         self.check_next_page()
 
+    def handle_items(self, items):
+        for item in items:
+            for obj in item:
+                obj = self.store(obj)
+                if obj and not self.flush_at_end:
+                    yield obj
+
     def flush(self):
         for obj in self.objects.values():
             yield obj
@@ -264,7 +434,7 @@ class SkipItem(Exception):
     """
 
 
-class _ItemElementMeta(type):
+class _ItemElementMeta(_ElementMeta):
     """
     Private meta-class used to keep order of obj_* attributes in :class:`ItemElement`.
     """
@@ -386,8 +556,7 @@ class ItemElement(with_metaclass(_ItemElementMeta, AbstractElement)):
                 raise
             else:
                 value = FetchError
-        logger = getLogger('b2filters')
-        logger.log(DEBUG_FILTERS, "%s.%s = %r" % (self._random_id, key, value))
+        _debug_logger.log(DEBUG_FILTERS, "%s.%s = %r", self._random_id, key, value)
         setattr(self.obj, key, value)
 
 
@@ -401,16 +570,18 @@ class TableElement(ListElement):
         self._cols = {}
 
         columns = {}
-        for attrname in dir(self):
-            m = re.match('col_(.*)', attrname)
-            if m:
-                cols = getattr(self, attrname)
-                if not isinstance(cols, (list,tuple)):
-                    cols = [cols]
-                columns[m.group(1)] = [s.lower() if isinstance(s, (str, unicode)) else s for s in cols]
+        for name, attrname in self._introspect()['columns']:
+            cols = getattr(self, attrname)
+            if not isinstance(cols, (list,tuple)):
+                cols = [cols]
+            columns[name] = [s.lower() if isinstance(s, (str, unicode)) else s for s in cols]
+
+        if self.is_streaming():
+            # Headers are before the first item.
+            self.page.parse_until(self.item_xpath)
 
         colnum = 0
-        for el in self.el.xpath(self.head_xpath):
+        for el in select_xpath(self.el, self.head_xpath):
             title = self.cleaner.clean(el)
             for name, titles in columns.items():
                 if name in self._cols:
@@ -20,13 +20,14 @@
 from functools import wraps
 
 import lxml.html
+from lxml import etree
 
 from weboob.exceptions import ParseError
 from weboob.tools.compat import unicode, basestring
 from weboob.tools.log import getLogger, DEBUG_FILTERS
 
 
-__all__ = ['FilterError', 'ItemNotFound', 'Filter',]
+__all__ = ['FilterError', 'ItemNotFound', 'Filter', 'compile_xpath', 'select_xpath']
 
 
 class NoDefault(object):
@@ -36,6 +37,53 @@ class NoDefault(object):
 _NO_DEFAULT = NoDefault()
 
 
+_XPATHS = {}
+_XPATHS_MAX = 1000
+
+
+def compile_xpath(selector):
+    """
+    Get the :class:`lxml.etree.XPath` object for a selector string, compiled
+    only the first time it is used.
+
+    Functions defined with :meth:`weboob.browser.pages.HTMLPage.define_xpath_functions`
+    are available, like with :meth:`lxml.etree._Element.xpath`.
+
+    :returns: the compiled XPath, or None if the selector is not valid
+    """
+    try:
+        return _XPATHS[selector]
+    except KeyError:
+        pass
+
+    try:
+        xpath = etree.XPath(selector)
+    except etree.XPathSyntaxError:
+        # Let the error be raised by evaluation, as without compilation.
+        xpath = None
+
+    if len(_XPATHS) >= _XPATHS_MAX:
+        # Selectors built at runtime (with ids, etc.) must not grow the cache forever.
+        _XPATHS.clear()
+    _XPATHS[selector] = xpath
+    return xpath
+
+
+def select_xpath(item, selector):
+    """
+    Evaluate a XPath selector string on an lxml node or an element.
+
+    >>> select_xpath(lxml.html.fromstring('<p><a>1</a><a>2</a></p>'), 'count(a)')
+    2.0
+    """
+    node = getattr(item, 'el', item)
+    if isinstance(node, (etree._Element, etree._ElementTree)):
+        xpath = compile_xpath(selector)
+        if xpath is not None:
+            return xpath(node)
+    return item.xpath(selector)
+
+
 class FilterError(ParseError):
     pass
 
@@ -91,47 +139,59 @@ class _Filter(object):
             el.attrib['title'] = 'weboob field: %s' % self._key
 
 
+_debug_logger = getLogger('b2filters')
+
+
+def _format_debug(f, value):
+    """
+    Describe a filter call for the debug log.
+    """
+    result = ''
+    outputvalue = value
+    if isinstance(value, list):
+        outputvalue = ''
+        first = True
+        for element in value:
+            if first:
+                first = False
+            else:
+                outputvalue += ', '
+            if isinstance(element, etree.ElementBase):
+                outputvalue += "%s" % etree.tostring(element, encoding=unicode)
+            else:
+                outputvalue += "%r" % element
+    if f._obj is not None:
+        result += "%s" % f._obj._random_id
+    if f._key is not None:
+        result += ".%s" % f._key
+    name = str(f)
+    result += " %s(%r" % (name, outputvalue)
+    for arg in f.__dict__:
+        if arg.startswith('_') or arg == u"selector":
+            continue
+        if arg == u'default' and getattr(f, arg) == _NO_DEFAULT:
+            continue
+        result += ", %s=%r" % (arg, getattr(f, arg))
+    result += u')'
+    return result
+
+
 def debug(*args):
     """
     A decorator function to provide some debug information
     in Filters.
     It prints by default the name of the Filter and the input value.
+
+    Nothing is computed when the DEBUG_FILTERS level is not enabled.
     """
     def wraper(function):
         @wraps(function)
         def print_debug(self, value):
-            logger = getLogger('b2filters')
-            result = ''
-            outputvalue = value
-            if isinstance(value, list):
-                from lxml import etree
-                outputvalue = ''
-                first = True
-                for element in value:
-                    if first:
-                        first = False
-                    else:
-                        outputvalue += ', '
-                    if isinstance(element, etree.ElementBase):
-                        outputvalue += "%s" % etree.tostring(element, encoding=unicode)
-                    else:
-                        outputvalue += "%r" % element
-            if self._obj is not None:
-                result += "%s" % self._obj._random_id
-            if self._key is not None:
-                result += ".%s" % self._key
-            name = str(self)
-            result += " %s(%r" % (name, outputvalue)
-            for arg in self.__dict__:
-                if arg.startswith('_') or arg == u"selector":
-                    continue
-                if arg == u'default' and getattr(self, arg) == _NO_DEFAULT:
-                    continue
-                result += ", %s=%r" % (arg, getattr(self, arg))
-            result += u')'
-            logger.log(DEBUG_FILTERS, result)
-            res = function(self, value)
-            return res
+            # The level is set by applications after filters are defined,
+            # and is cached by the logger.
+            if _debug_logger.isEnabledFor(DEBUG_FILTERS):
+                _debug_logger.log(DEBUG_FILTERS, _format_debug(self, value))
+            return function(self, value)
         return print_debug
     return wraper
 
@@ -161,7 +221,7 @@ class Filter(_Filter):
 
     def select(self, selector, item):
         if isinstance(selector, basestring):
-            ret = item.xpath(selector)
+            ret = select_xpath(item, selector)
         elif isinstance(selector, _Filter):
             selector._key = self._key
             selector._obj = self._obj
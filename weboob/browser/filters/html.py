@@ -20,6 +20,7 @@ import datetime
 from decimal import Decimal
 
 import lxml.html as html
+from lxml.cssselect import CSSSelector
 from six.moves.html_parser import HTMLParser
 
 from weboob.tools.compat import basestring, unicode, urljoin
@@ -56,8 +57,29 @@ class CSS(_Selector):
 
     will take the text of all ``<div>`` having CSS class "main".
     """
+    _compiled = {}
+
+    @classmethod
+    def compile(cls, selector, translator):
+        """
+        Get the :class:`lxml.cssselect.CSSSelector` for a selector string,
+        translated to XPath only the first time it is used.
+        """
+        key = (selector, translator)
+        try:
+            return cls._compiled[key]
+        except KeyError:
+            compiled = cls._compiled[key] = CSSSelector(selector, translator=translator)
+            return compiled
+
     def select(self, selector, item):
-        ret = item.cssselect(selector)
+        node = getattr(item, 'el', item)
+        if isinstance(node, html.HtmlElement):
+            ret = self.compile(selector, 'html')(node)
+        elif isinstance(node, html.etree._Element):
+            ret = self.compile(selector, 'xml')(node)
+        else:
+            ret = item.cssselect(selector)
         if isinstance(ret, list):
             for el in ret:
                 if isinstance(el, html.HtmlElement):
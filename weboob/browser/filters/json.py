@@ -47,11 +47,19 @@ class Dict(with_metaclass(_DictMeta, Filter)):
             self.selector = [selector]
         else:
             self.selector = selector
+        self._steps = self.compile(self.selector)
 
     def __getitem__(self, name):
         self.selector.append(name)
+        self._steps = self.compile(self.selector)
         return self
 
+    def __call__(self, item):
+        if getattr(type(self).select, '__func__', None) is not Dict.select.__func__:
+            # select() is overridden and expects the selector.
+            return self.filter(self.select(self.selector, item))
+        return self.filter(self.select_compiled(self._steps, item))
+
     @debug()
     def filter(self, elements):
         if elements is not _NOT_FOUND:
@@ -59,21 +67,43 @@ class Dict(with_metaclass(_DictMeta, Filter)):
         else:
             return self.default_or_raise(ItemNotFound('Element %r not found' % self.selector))
 
+    @classmethod
+    def compile(cls, selector):
+        """
+        Compile a selector into a tuple of `(key, index, dynamic)` steps,
+        where `index` is the key as an integer for lists, and `dynamic` tells
+        if the key is a filter or a function to call on the item.
+        """
+        steps = []
+        for el in selector:
+            if isinstance(el, _Filter) or callable(el):
+                steps.append((el, None, True))
+                continue
+            try:
+                index = int(el)
+            except (ValueError, TypeError):
+                index = None
+            steps.append((el, index, False))
+        return tuple(steps)
+
     @classmethod
     def select(cls, selector, item, obj=None, key=None):
+        return cls.select_compiled(cls.compile(selector), item, obj, key)
+
+    @classmethod
+    def select_compiled(cls, steps, item, obj=None, key=None):
         if isinstance(item, (dict, list)):
             content = item
         else:
             content = item.el
 
-        for el in selector:
+        for el, index, dynamic in steps:
             if isinstance(content, list):
-                el = int(el)
-            elif isinstance(el, _Filter):
-                el._key = key
-                el._obj = obj
-                el = el(item)
-            elif callable(el):
+                el = int(el) if index is None else index
+            elif dynamic:
+                if isinstance(el, _Filter):
+                    el._key = key
+                    el._obj = obj
                 el = el(item)
 
             try:
@@ -34,7 +34,7 @@ from weboob.capabilities.base import Currency as BaseCurrency
 from weboob.capabilities.base import empty
 from weboob.tools.compat import basestring, long, parse_qs, unicode, urlparse
 
-from .base import _NO_DEFAULT, Filter, FilterError, ItemNotFound, _Filter, debug
+from .base import _NO_DEFAULT, Filter, FilterError, ItemNotFound, _Filter, debug, select_xpath
 
 __all__ = [
     'Filter', 'FilterError', 'ColumnNotFound', 'RegexpError', 'FormatError',
@@ -222,7 +222,7 @@ class TableCell(_Filter):
             if col_idx is not None:
                 current_col = 0
                 for td_idx in range(col_idx + 1):
-                    ret = item.xpath(self.td % (td_idx + 1))
+                    ret = select_xpath(item, self.td % (td_idx + 1))
                     if col_idx <= current_col:
                         for el in ret:
                             self.highlight_el(el, item)
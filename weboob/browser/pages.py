@@ -22,7 +22,7 @@ from __future__ import absolute_import
 from collections import OrderedDict
 from functools import wraps
 import warnings
-from io import BytesIO, StringIO
+from io import BytesIO, StringIO, TextIOWrapper
 import codecs
 from cgi import parse_header
 from functools import reduce
@@ -32,7 +32,7 @@ import sys
 import requests
 
 from weboob.exceptions import ParseError, ModuleInstallError
-from weboob.tools.compat import basestring, unicode, urljoin
+from weboob.tools.compat import Mapping, basestring, unicode, urljoin
 from weboob.tools.log import getLogger
 from weboob.tools.pdf import decompress_pdf
 from .exceptions import LoggedOut
@@ -133,6 +133,8 @@ class Page(object):
     :class:`LoginBrowser` and the :func:`need_login` decorator.
     """
 
+    _detected_encodings = {}
+
     def __new__(cls, *args, **kwargs):
         """ Accept any arguments, necessary for AbstractPage __new__ override.
 
@@ -154,16 +156,78 @@ class Page(object):
         self.forced_encoding = self.normalize_encoding(encoding or self.ENCODING)
         if self.forced_encoding:
             self.response.encoding = self.forced_encoding
-        self.doc = self.build_doc(self.data)
 
-        # Last chance to change encoding, according to :meth:`detect_encoding`,
-        # which can be used to detect a document-level encoding declaration
+        self.load_doc()
+
+    def load_doc(self):
+        """
+        Build :attr:`doc` from the response, once its encoding is known.
+        """
+        # When several pages are tried for a response, a document built by a
+        # page rejected by its is_here is reused by the next ones which
+        # would build it the same way.
+        shared_docs = getattr(self.response, '_shared_docs', None)
+        doc_key = self.get_doc_key()
+        if doc_key is None:
+            shared_docs = None
+        if shared_docs is not None and doc_key in shared_docs:
+            self.doc = shared_docs[doc_key]
+            return
+
+        # Look for a document-level encoding declaration in raw data, to
+        # build the document only once.
+        encoding = None
         if not self.forced_encoding:
+            encoding = self.sniff_encoding()
+            if encoding:
+                self.response.encoding = encoding
+
+        if self.forced_encoding or encoding:
+            self.doc = self.build_doc(self.data)
+        else:
+            # Last chance to change encoding, according to :meth:`detect_encoding`,
+            # which can be used to detect a document-level encoding declaration.
+            # The document is first built with the encoding detected for the
+            # previous responses of this class, which is likely to be right.
+            response_encoding = self.response.encoding
+            memo_key = (type(self), self.encoding)
+            guess = Page._detected_encodings.get(memo_key)
+            if guess:
+                self.response.encoding = guess
+            doc_encoding = self.encoding
+            self.doc = self.build_doc(self.data)
+
+            self.response.encoding = response_encoding
             encoding = self.detect_encoding()
-            if encoding and encoding != self.encoding:
+            if encoding:
+                Page._detected_encodings[memo_key] = encoding
                 self.response.encoding = encoding
+            if self.encoding != doc_encoding:
                 self.doc = self.build_doc(self.data)
 
+        if shared_docs is not None:
+            shared_docs[doc_key] = self.doc
+
+    def get_doc_key(self):
+        """
+        Get a key identifying how :attr:`doc` is built, so that pages with the
+        same key tried for a response share it. As :meth:`is_here` is then
+        called on a document built by another page, it must not modify it.
+
+        :returns: None to never share the document
+        """
+        return None
+
+    def _base_doc_key(self, base, *params):
+        # Only pages building their document like `base` does share it, as
+        # overridden methods may depend on attributes of their class.
+        klass = type(self)
+        for name in ('__init__', 'load_doc', 'data', 'build_doc', 'get_parser_encoding',
+                     'detect_encoding', 'sniff_encoding', 'check_encoding'):
+            if getattr(klass, name, None) != getattr(base, name, None):
+                return None
+        return (base, self.forced_encoding) + params
+
     # Encoding issues are delegated to Response instance, implemented by
     # requests module.
 
@@ -223,6 +287,16 @@ class Page(object):
         """
         return None
 
+    def sniff_encoding(self):
+        """
+        Override this method to detect the document-level encoding declaration
+        from raw :attr:`data`, before the document is built.
+
+        If it returns None, the document is built with the response encoding,
+        and :meth:`detect_encoding` is then called on it.
+        """
+        return None
+
     def normalize_encoding(self, encoding):
         """
         Make sure we can easily compare encodings by formatting them the same way.
@@ -389,7 +463,16 @@ class CsvPage(Page):
     This means the rows will be also available as dictionaries.
     """
 
+    LAZY = False
+    """
+    If True, :attr:`doc` is a :class:`CsvDocument`, which parses rows only
+    when they are read, instead of a list.
+    """
+
     def build_doc(self, content):
+        if self.LAZY:
+            return CsvDocument(self, content)
+
         # We may need to temporarily convert content to utf-8 because csv
         # does not support Unicode.
         encoding = self.encoding
@@ -412,29 +495,41 @@ class CsvPage(Page):
         :param encoding: if given, use it to decode cell strings
         :type encoding: :class:`str`
         """
-        import csv
-        reader = csv.reader(data, dialect=self.DIALECT, **self.FMTPARAMS)
         header = None
         drows = []
         rows = []
-        for i, row in enumerate(reader):
-            if self.HEADER and i+1 < self.HEADER:
-                continue
-            if sys.version_info.major > 2:
-                row = [c.strip() for c in row]
-            else:
-                row = [c.strip() for c in self.decode_row(row, encoding)]
+        for row in self.iter_rows(data, encoding):
             if header is None and self.HEADER:
                 header = row
+            elif header:
+                drow = {}
+                for i, cell in enumerate(row):
+                    drow[header[i]] = cell
+                drows.append(drow)
             else:
                 rows.append(row)
-                if header:
-                    drow = {}
-                    for i, cell in enumerate(row):
-                        drow[header[i]] = cell
-                    drows.append(drow)
         return drows if header is not None else rows
 
+    def iter_rows(self, data, encoding=None):
+        """
+        Iter on rows of the file stream, starting from the :attr:`HEADER`
+        line if set.
+
+        :param data: file stream
+        :type data: :class:`BytesIO`
+        :param encoding: if given, use it to decode cell strings
+        :type encoding: :class:`str`
+        """
+        import csv
+        reader = csv.reader(data, dialect=self.DIALECT, **self.FMTPARAMS)
+        for i, row in enumerate(reader):
+            if self.HEADER and i+1 < self.HEADER:
+                continue
+            if sys.version_info.major > 2:
+                yield [c.strip() for c in row]
+            else:
+                yield [c.strip() for c in self.decode_row(row, encoding)]
+
     def decode_row(self, row, encoding):
         """
         Method called by :meth:`CsvPage.parse` to decode a row using the given encoding.
@@ -445,6 +540,135 @@ class CsvPage(Page):
             return row
 
 
+class CsvRow(Mapping):
+    """
+    Row of a :class:`CsvDocument` with a header, readable like a dict.
+
+    Rows only store their cells, and share the index of header names.
+    """
+
+    __slots__ = ('_index', 'cells')
+
+    def __init__(self, index, cells):
+        self._index = index
+        self.cells = cells
+
+    def __getitem__(self, name):
+        try:
+            return self.cells[self._index[name]]
+        except IndexError:
+            raise KeyError(name)
+
+    def __iter__(self):
+        for name, i in self._index.items():
+            if i < len(self.cells):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, dict(self))
+
+
+class CsvDocument(object):
+    """
+    Document of a :class:`CsvPage` with :attr:`CsvPage.LAZY` set.
+
+    Rows are parsed each time the document is iterated, so that they are
+    never all in memory. With a :attr:`CsvPage.HEADER`, they are
+    :class:`CsvRow` records, otherwise lists of cells.
+
+    Indexing the document or getting its length keeps all rows. For
+    compatibility, :attr:`rows` and :attr:`dicts` give them as lists of
+    lists and lists of dicts.
+    """
+
+    def __init__(self, page, content):
+        self.page = page
+        self.content = content
+        self.encoding = page.encoding
+        self._header = None
+        self._records = None
+
+    def open(self):
+        """
+        Get a new stream of the content, decoded while it is read.
+        """
+        if sys.version_info.major > 2:
+            encoding = self.encoding
+            if encoding == 'utf-16le':
+                # If there is a BOM, utf-16 will get rid of it
+                encoding = 'utf-16'
+            return TextIOWrapper(BytesIO(self.content), encoding=encoding,
+                                 newline=None if self.page.NEWLINES_HACK else '')
+
+        content = self.content
+        if self.page.NEWLINES_HACK:
+            content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        return BytesIO(content)
+
+    def iter_cells(self):
+        """
+        Iter on lists of cells of all rows, header included.
+        """
+        encoding = None
+        if sys.version_info.major <= 2:
+            encoding = self.encoding
+        return self.page.iter_rows(self.open(), encoding)
+
+    @property
+    def header(self):
+        """
+        Names of columns, or None if the page has no :attr:`CsvPage.HEADER`.
+        """
+        if self._header is None and self.page.HEADER:
+            self._header = next(self.iter_cells(), [])
+        return self._header
+
+    def __iter__(self):
+        rows = self.iter_cells()
+        if not self.page.HEADER:
+            for row in rows:
+                yield row
+            return
+
+        header = next(rows, None)
+        if header is None:
+            return
+        self._header = header
+        index = dict((name, i) for i, name in enumerate(header))
+        for row in rows:
+            yield CsvRow(index, row)
+
+    def _get_records(self):
+        if self._records is None:
+            self._records = list(iter(self))
+        return self._records
+
+    def __len__(self):
+        return len(self._get_records())
+
+    def __getitem__(self, i):
+        return self._get_records()[i]
+
+    @property
+    def rows(self):
+        """
+        All rows, header excluded, as lists of cells.
+        """
+        if not self.page.HEADER:
+            return list(self)
+        return [row.cells for row in self]
+
+    @property
+    def dicts(self):
+        """
+        All rows as dicts, if the page has a :attr:`CsvPage.HEADER`.
+        """
+        return [dict(row) for row in self]
+
+
 class JsonPage(Page):
     """
     Json Page.
@@ -459,6 +683,10 @@ class JsonPage(Page):
 
     @property
     def data(self):
+        # The document is decoded from raw content, unless build_doc is
+        # overridden and expects text.
+        if type(self).build_doc == JsonPage.build_doc and self.encoding == 'utf-8':
+            return self.content
         return self.response.text
 
     def get(self, path):
@@ -472,8 +700,8 @@ class JsonPage(Page):
         return mini_jsonpath(context or self.doc, path)
 
     def build_doc(self, text):
-        from weboob.tools.json import json
-        return json.loads(text)
+        from weboob.tools.json import loads
+        return loads(text)
 
 
 class XLSPage(Page):
@@ -532,6 +760,12 @@ class XMLPage(Page):
         if m:
             return self.normalize_encoding(m.group(1))
 
+    def sniff_encoding(self):
+        return self.detect_encoding()
+
+    def get_doc_key(self):
+        return self._base_doc_key(XMLPage)
+
     def build_doc(self, content):
         import lxml.etree as etree
         parser = etree.XMLParser(encoding=self.encoding)
@@ -580,6 +814,15 @@ class HTMLPage(Page):
     Default xpath, which is also the most commun, override it if needed
     """
 
+    ENCODING_SNIFF_SIZE = 4096
+    """
+    Number of bytes in which :meth:`sniff_encoding` looks for "meta" nodes.
+    """
+
+    META_RE = re.compile(br'<meta\s[^>]*>', re.IGNORECASE)
+    ATTRIBUTE_RE = re.compile(br'([^\s=/>]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+    HEAD_END_RE = re.compile(br'</head|<body', re.IGNORECASE)
+
     def __init__(self, *args, **kwargs):
         import lxml.html as html
         ns = html.etree.FunctionNamespace(None)
@@ -676,18 +919,27 @@ class HTMLPage(Page):
         ns['matches'] = matches
         ns['first-non-empty'] = first_non_empty
 
+    def get_doc_key(self):
+        return self._base_doc_key(HTMLPage, self.ENCODING_SNIFF_SIZE)
+
     def build_doc(self, content):
         """
         Method to build the lxml document from response and given encoding.
         """
+        import lxml.html as html
+        parser = html.HTMLParser(encoding=self.get_parser_encoding())
+        return html.parse(BytesIO(content), parser)
+
+    def get_parser_encoding(self):
+        """
+        Get the name of :attr:`encoding` understood by lxml.
+        """
         encoding = self.encoding
         if encoding == u'latin-1':
             encoding = u'latin1'
         if encoding:
             encoding = encoding.replace(u'iso8859_', u'iso8859-')
-        import lxml.html as html
-        parser = html.HTMLParser(encoding=encoding)
-        return html.parse(BytesIO(content), parser)
+        return encoding
 
     def detect_encoding(self):
         """
@@ -704,6 +956,49 @@ class HTMLPage(Page):
             # meta charset=...
             encoding = self.normalize_encoding(charset)
 
+        return self.check_encoding(encoding)
+
+    def sniff_encoding(self):
+        """
+        Look for encoding in the "http-equiv" and "charset" meta nodes at the
+        beginning of raw data, like browsers do.
+
+        Returns None if the head of the document is too large to know if
+        there is a declaration.
+        """
+        data = self.data
+        if not isinstance(data, bytes):
+            return None
+
+        head = re.sub(br'<!--.*?-->', b'', data[:self.ENCODING_SNIFF_SIZE], flags=re.DOTALL)
+        m = self.HEAD_END_RE.search(head)
+        if m:
+            head = head[:m.start()]
+
+        http_equiv = charset = None
+        for meta in self.META_RE.findall(head):
+            attrs = dict((name.lower(), value.strip(b'\'"').decode('latin-1'))
+                         for name, value in self.ATTRIBUTE_RE.findall(meta))
+            if attrs.get(b'http-equiv', '').lower() == 'content-type':
+                _, params = parse_header(attrs.get(b'content', ''))
+                if 'charset' in params:
+                    http_equiv = self.normalize_encoding(params['charset'].strip("'\""))
+            if b'charset' in attrs:
+                charset = self.normalize_encoding(attrs[b'charset'])
+
+        encoding = charset or http_equiv
+        if encoding is None:
+            if m is None and len(data) > self.ENCODING_SNIFF_SIZE:
+                return None
+            encoding = self.encoding
+
+        return self.check_encoding(encoding)
+
+    def check_encoding(self, encoding):
+        """
+        Get the encoding to use for a declared encoding, falling back to
+        windows-1252 like browsers do.
+        """
         if encoding == u'iso-8859-1' or not encoding:
             encoding = u'windows-1252'
         try:
@@ -776,6 +1071,183 @@ class PartialHTMLPage(HTMLPage):
         return super(PartialHTMLPage, self).build_doc(content)
 
 
+class StreamingPage(object):
+    """
+    Mixin to parse a document while it is downloaded, for very large pages.
+
+    The document is not fully built when the page is created. A
+    :class:`weboob.browser.elements.ListElement` working on the whole
+    document gets the nodes matching its `item_xpath` as soon as they are
+    parsed, and they are cleared once processed, so that memory stays low.
+    Open the response with `stream=True` to also avoid loading its whole
+    content, and get the first items before the end of the download:
+
+    >>> browser.location(browser.statement.build(), stream=True) # doctest: +SKIP
+    >>> for tr in browser.page.iter_transactions(): # doctest: +SKIP
+    ...     print(tr)
+
+    :attr:`doc` only contains the part of the document parsed so far, without
+    the nodes already processed and their previous siblings, which are
+    removed. :meth:`is_here` and `head_xpath` of
+    :class:`weboob.browser.elements.TableElement` have to look at the
+    beginning of the document.
+
+    As the document is parsed only once, its encoding has to be declared in
+    the first :attr:`ENCODING_SNIFF_SIZE` bytes, or be forced with
+    :attr:`ENCODING`.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    """
+    Number of bytes read from the response at once.
+    """
+
+    ENCODING_SNIFF_SIZE = 4096
+
+    def load_doc(self):
+        self._chunks = self.response.iter_content(self.CHUNK_SIZE)
+        self._head = b''
+        self._tree = None
+        self._open = []
+        self._ended = None
+        self._finished = False
+        while len(self._head) <= self.ENCODING_SNIFF_SIZE:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._head += chunk
+
+        self._response_encoding = self.encoding
+        if not self.forced_encoding:
+            encoding = self.sniff_encoding() or Page._detected_encodings.get((type(self), self.encoding))
+            if encoding:
+                self.response.encoding = encoding
+
+        self._parser = self.build_parser()
+        self._parser.feed(self._head)
+        self._read_events()
+        while self._tree is None and not self._finished:
+            self._feed()
+
+    @property
+    def data(self):
+        """
+        Beginning of the raw content, used to detect its encoding.
+        """
+        return self._head
+
+    @property
+    def doc(self):
+        return self._tree
+
+    def build_parser(self):
+        """
+        Abstract method to be implemented by subclasses to get the lxml
+        feed parser of the document.
+        """
+        raise NotImplementedError()
+
+    def _read_events(self):
+        for event, el in self._parser.read_events():
+            if event == 'start':
+                if self._tree is None:
+                    self._tree = el.getroottree()
+                self._open.append(el)
+            else:
+                self._open.pop()
+                if self._ended is not None:
+                    self._ended.append(el)
+
+    def _feed(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            root = self._parser.close()
+            if self._tree is None:
+                # Empty document
+                import lxml.etree as etree
+                self._tree = etree.ElementTree(root)
+            self._open = []
+            self._finished = True
+
+            # Remember the encoding for the next responses of this class.
+            if not self.forced_encoding and root is not None:
+                encoding = self.detect_encoding()
+                if encoding:
+                    Page._detected_encodings[(type(self), self._response_encoding)] = encoding
+        else:
+            self._parser.feed(chunk)
+            self._read_events()
+
+    def parse_until(self, xpath):
+        """
+        Parse the document until the first node matching the xpath is
+        complete, or until its end.
+        """
+        while not self._finished:
+            for el in self._tree.xpath(xpath):
+                if el not in self._open:
+                    return
+                break
+            self._feed()
+
+    def iter_xpath(self, xpath):
+        """
+        Iter on nodes matching the xpath as soon as they are completely
+        parsed, in document order.
+
+        A node is cleared when the next one is requested, and its previous
+        siblings are removed from the document.
+        """
+        # Only nodes ended since the last lookup may be new matches, the
+        # first lookup takes every complete node.
+        ended = None
+        self._ended = []
+        try:
+            while True:
+                if ended is None or ended:
+                    waiting = set()
+                    for el in self._tree.xpath(xpath):
+                        if ended is not None and el not in ended:
+                            continue
+                        if waiting or el in self._open:
+                            # Next nodes are inside an open one.
+                            if el not in self._open:
+                                waiting.add(el)
+                            continue
+                        yield el
+                        el.clear()
+                        while el.getprevious() is not None:
+                            del el.getparent()[0]
+                    ended = waiting
+                if self._finished:
+                    return
+                self._feed()
+                ended.update(self._ended)
+                del self._ended[:]
+        finally:
+            self._ended = None
+
+
+class StreamingHTMLPage(StreamingPage, HTMLPage):
+    """
+    HTML page parsed while it is downloaded, see :class:`StreamingPage`.
+    """
+
+    def build_parser(self):
+        import lxml.etree as etree
+        return etree.HTMLPullParser(events=('start', 'end'), encoding=self.get_parser_encoding())
+
+
+class StreamingXMLPage(StreamingPage, XMLPage):
+    """
+    XML page parsed while it is downloaded, see :class:`StreamingPage`.
+    """
+
+    def build_parser(self):
+        import lxml.etree as etree
+        return etree.XMLPullParser(events=('start', 'end'), encoding=self.encoding)
+
+
 class GWTPage(Page):
     """
     GWT page where the "doc" attribute is a list
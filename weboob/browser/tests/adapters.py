@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+from io import BytesIO
+from threading import Event, Thread
+from unittest import TestCase, skipIf
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from weboob.browser import Browser
+from weboob.browser import adapters
+from weboob.browser.adapters import HTTP2Adapter, HTTPAdapter, httpx
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/gzip':
+            buf = BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+                f.write(b'hello world')
+            body = buf.getvalue()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Set-Cookie', 'session=42; Path=/')
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/stream':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', '10')
+            self.end_headers()
+            self.wfile.write(b'first')
+            self.wfile.flush()
+            if self.server.release.wait(5):
+                self.wfile.write(b'-last')
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ServerTestCase(TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.release = Event()
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.baseurl = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SharedBrowser(Browser):
+    SHARE_CONNECTIONS = True
+
+
+class SharedAdapterTest(ServerTestCase):
+    def test_shared(self):
+        first = SharedBrowser()
+        second = SharedBrowser()
+        other = SharedBrowser(proxy={'http': 'http://127.0.0.1:1'})
+        alone = Browser()
+
+        adapter = first.session.get_adapter(self.baseurl)
+        self.assertIsInstance(adapter, HTTPAdapter)
+        self.assertIs(second.session.get_adapter(self.baseurl), adapter)
+        self.assertIs(first.session.get_adapter('https://example.org'), adapter)
+        self.assertIsNot(other.session.get_adapter(self.baseurl), adapter)
+        self.assertIsNot(alone.session.get_adapter(self.baseurl), adapter)
+
+        # Connections are reused by both browsers.
+        self.server.release.set()
+        first.open(self.baseurl + '/gzip')
+        second.open(self.baseurl + '/gzip')
+        pools = adapter.poolmanager.pools
+        key, = pools.keys()
+        self.assertEqual(pools[key].num_connections, 1)
+
+        # Each browser has its own cookies.
+        second.session.cookies.clear()
+        self.assertEqual(first.session.cookies.get('session'), '42')
+        self.assertIsNone(second.session.cookies.get('session'))
+
+        first.deinit()
+        self.assertIn(adapter._shared_key, adapters._shared_adapters)
+        self.assertEqual(len(adapter.poolmanager.pools), 1)
+
+        second.deinit()
+        self.assertNotIn(adapter, adapters._shared_adapters.values())
+        self.assertEqual(len(adapter.poolmanager.pools), 0)
+
+        other.deinit()
+        alone.deinit()
+        self.assertEqual(adapters._shared_adapters, {})
+
+
+class H2Browser(Browser):
+    TRANSPORT = 'h2'
+
+
+@skipIf(httpx is None, 'httpx is not installed')
+class HTTP2AdapterTest(ServerTestCase):
+    def setUp(self):
+        super(HTTP2AdapterTest, self).setUp()
+        self.browser = H2Browser()
+        self.assertIsInstance(self.browser.session.get_adapter(self.baseurl), HTTP2Adapter)
+
+    def tearDown(self):
+        self.browser.deinit()
+        super(HTTP2AdapterTest, self).tearDown()
+
+    def test_decoded(self):
+        response = self.browser.open(self.baseurl + '/gzip')
+        self.assertEqual(response.content, b'hello world')
+        # The body is already decoded by httpx.
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(self.browser.session.cookies.get('session'), '42')
+
+    def test_stream(self):
+        response = self.browser.open(self.baseurl + '/stream', stream=True)
+        chunks = response.iter_content(5)
+        # The beginning of the body is read before the end is sent.
+        self.assertEqual(next(chunks), b'first')
+        self.server.release.set()
+        self.assertEqual(b''.join(chunks), b'-last')
+
+    def test_stream_raw(self):
+        self.server.release.set()
+        response = self.browser.open(self.baseurl + '/stream', stream=True)
+        self.assertEqual(response.raw.read(3), b'fir')
+        self.assertEqual(response.raw.read(), b'st-last')
+        response.close()
+        self.assertTrue(response.raw.closed)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmarks of the browser hot paths.
+
+They are not run with the tests. To run them all, or only some of them:
+
+    $ python -m weboob.browser.tests.benchmarks [name ...]
+"""
+
+from __future__ import print_function
+
+import logging
+import sys
+from timeit import default_timer
+
+from requests import Response
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.elements import DictElement, ItemElement, TableElement, method
+from weboob.browser.filters.html import CSS
+from weboob.browser.filters.json import Dict
+from weboob.browser.filters.standard import CleanDecimal, CleanText, Date, TableCell
+from weboob.browser.pages import HTMLPage, JsonPage
+from weboob.capabilities.bank import Account, Transaction
+from weboob.tools.json import json
+from weboob.tools.log import DEBUG_FILTERS
+
+
+def timeit(func, number):
+    start = default_timer()
+    for _ in range(number):
+        func()
+    return (default_timer() - start) / number
+
+
+class BenchBrowser(PagesBrowser):
+    BASEURL = 'https://bank.example.org/'
+
+    accounts = URL(r'/accounts$', r'/accounts/(?P<page>\d+)$')
+    history = URL(r'/accounts/(?P<account_id>\w+)/history\?start=(?P<start>\d+)',
+                  r'/accounts/(?P<account_id>\w+)/history')
+    investment = URL(r'/accounts/(?P<account_id>\w+)/invest/(?P<isin>[A-Z0-9]{12})(?:/(?P<detail>\w+))?')
+
+
+def bench_url_build(number=20000):
+    browser = BenchBrowser()
+    calls = [
+        lambda: browser.accounts.build(),
+        lambda: browser.accounts.build(page=2),
+        lambda: browser.history.build(account_id='1234', start=50),
+        lambda: browser.history.build(account_id='1234'),
+        lambda: browser.investment.build(account_id='1234', isin='FR0000120271', detail='perf'),
+    ]
+
+    def run():
+        for call in calls:
+            call()
+
+    return 'URL.build', timeit(run, number // len(calls)) / len(calls)
+
+
+def make_response(content, content_type='text/html'):
+    response = Response()
+    response.status_code = 200
+    response.url = BenchBrowser.BASEURL
+    response.headers['Content-Type'] = content_type
+    response.encoding = 'utf-8' if 'utf-8' in content_type else 'iso-8859-1'
+    response._content = content
+    return response
+
+
+def make_html_history(count=500):
+    # Like many banks, declare another charset than the HTTP one.
+    rows = u''.join(u'<tr><td>%d</td><td class="label">Prélèvement n°%d</td><td>-%d,00 €</td></tr>' % (i, i, i)
+                    for i in range(count))
+    return (u'<html><head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">'
+            u'<title>Historique</title></head><body><table>%s</table></body></html>' % rows).encode('utf-8')
+
+
+def bench_html_page(number=200):
+    content = make_html_history()
+    browser = BenchBrowser()
+
+    def run():
+        HTMLPage(browser, make_response(content, 'text/html; charset=iso-8859-1'))
+
+    return 'HTMLPage', timeit(run, number)
+
+
+class HistoryJsonPage(JsonPage):
+    @method
+    class iter_history(DictElement):
+        item_xpath = 'data/transactions'
+
+        class item(ItemElement):
+            klass = Transaction
+
+            obj_id = Dict('id')
+            obj_raw = Dict('label/raw')
+            obj_label = Dict('label/short')
+            obj_type = Dict('type/0')
+
+
+def make_json_history(count=10000):
+    transactions = [
+        {'id': str(i), 'label': {'raw': u'PRLV SEPA ÉDF %d' % i, 'short': u'EDF'}, 'type': [2, 'debit'],
+         'amount': -i - 0.5, 'date': '2020-02-01', 'coming': False}
+        for i in range(count)
+    ]
+    return json.dumps({'data': {'transactions': transactions}}).encode('utf-8')
+
+
+def bench_json_page(number=20):
+    content = make_json_history()
+    browser = BenchBrowser()
+
+    def run():
+        JsonPage(browser, make_response(content, 'application/json'))
+
+    return 'JsonPage (10k items)', timeit(run, number)
+
+
+def bench_dict_filter(number=10):
+    content = make_json_history()
+    browser = BenchBrowser()
+    page = HistoryJsonPage(browser, make_response(content, 'application/json'))
+    filters = [Dict('id'), Dict('label/raw'), Dict('label/short'), Dict('type/0')]
+    items = page.doc['data']['transactions']
+
+    def run():
+        for item in items:
+            for f in filters:
+                f(item)
+
+    return 'Dict (10k items x 4)', timeit(run, number)
+
+
+def bench_html_filters(number=20):
+    browser = BenchBrowser()
+    page = HTMLPage(browser, make_response(make_html_history(), 'text/html; charset=utf-8'))
+    filters = [CleanText('./td[1]'), CleanText(CSS('td.label')), CleanDecimal('./td[3]', replace_dots=True)]
+    rows = page.doc.xpath('//tr')
+
+    def run():
+        for row in rows:
+            for f in filters:
+                f(row)
+
+    return 'HTML filters (500 rows x 3)', timeit(run, number)
+
+
+class HistoryHTMLPage(HTMLPage):
+    @method
+    class iter_history(TableElement):
+        head_xpath = '//table/thead/tr/th'
+        item_xpath = '//table/tbody/tr'
+
+        col_date = u'Date'
+        col_label = u'Libellé'
+        col_amount = u'Montant'
+
+        class item(ItemElement):
+            klass = Transaction
+
+            obj_id = CleanText(TableCell('label'))
+            obj_date = Date(CleanText(TableCell('date')), dayfirst=True)
+            obj_raw = CleanText(TableCell('label'))
+            obj_amount = CleanDecimal(TableCell('amount'), replace_dots=True)
+
+
+def bench_table_element(number=5, count=2000):
+    rows = u''.join(u'<tr><td>%02d/01/2020</td><td>CB %d</td><td>-%d,00</td></tr>' % (i % 28 + 1, i, i)
+                    for i in range(count))
+    content = (u'<html><body><table><thead><tr><th>Date</th><th>Libellé</th><th>Montant</th></tr></thead>'
+               u'<tbody>%s</tbody></table></body></html>' % rows).encode('utf-8')
+    browser = BenchBrowser()
+    page = HistoryHTMLPage(browser, make_response(content, 'text/html; charset=utf-8'))
+    page.params = {'account_id': '1234'}
+    account = Account(id='1234')
+    account.label = u'Compte courant'
+
+    def run():
+        for _ in page.iter_history(account=account):
+            pass
+
+    return 'TableElement (2k items)', timeit(run, number), count
+
+
+def bench_table_element_debug(number=5, count=2000):
+    # Same as table_element, with the filters debug log enabled (and discarded).
+    logger = logging.getLogger('b2filters')
+    level, propagate, handlers = logger.level, logger.propagate, logger.handlers
+    logger.setLevel(DEBUG_FILTERS)
+    logger.propagate = False
+    logger.handlers = [logging.NullHandler()]
+    try:
+        label, duration, count = bench_table_element(number, count)
+    finally:
+        logger.setLevel(level)
+        logger.propagate, logger.handlers = propagate, handlers
+    return '%s, debug' % label, duration, count
+
+
+BENCHMARKS = [bench_url_build, bench_html_page, bench_json_page, bench_dict_filter, bench_html_filters,
+              bench_table_element, bench_table_element_debug]
+
+
+def main(names):
+    for bench in BENCHMARKS:
+        if names and bench.__name__[len('bench_'):] not in names:
+            continue
+        result = bench()
+        label, duration = result[:2]
+        line = '%-30s %10.2f µs' % (label, duration * 1e6)
+        if len(result) > 2:
+            # Number of items parsed by each run.
+            line += '  %10d items/s' % (result[2] / duration)
+        print(line)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.cache import CacheMixin, SQLiteCache
+from weboob.browser.pages import HTMLPage
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """
+    Transport answering requests without network, with the headers given in
+    `headers`, and the requested url as body.
+    """
+
+    def __init__(self):
+        super(FakeAdapter, self).__init__()
+        self.requests = []
+        self.headers = {}
+        self.not_modified = False
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        if self.not_modified and 'If-None-Match' in request.headers:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = request.url.encode('ascii')
+        response.headers['Content-Type'] = 'text/html'
+        response.headers.update(self.headers)
+        return response
+
+    def close(self):
+        pass
+
+
+class ItemPage(HTMLPage):
+    pass
+
+
+class CacheBrowser(CacheMixin, PagesBrowser):
+    BASEURL = 'http://example.org/'
+
+    item = URL(r'/item\?page=\d+', ItemPage)
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        self.browser = CacheBrowser()
+        self.adapter = FakeAdapter()
+        self.browser.session.mount('http://', self.adapter)
+
+    def tearDown(self):
+        self.browser.deinit()
+
+    def open(self, url='/item', **kwargs):
+        return self.browser.open_with_cache(url, **kwargs)
+
+    def test_params(self):
+        self.adapter.headers['Cache-Control'] = 'max-age=60'
+        self.assertEqual(self.open(params={'page': 1}).text, 'http://example.org/item?page=1')
+        self.assertEqual(self.open(params={'page': 2}).text, 'http://example.org/item?page=2')
+        self.assertEqual(self.open(params={'page': 1}).text, 'http://example.org/item?page=1')
+        self.assertEqual(len(self.adapter.requests), 2)
+
+    def test_headers(self):
+        self.adapter.headers['Cache-Control'] = 'max-age=60'
+        self.open()
+        # Some headers do not change the response.
+        self.open(headers={'Referer': 'http://example.org/other'})
+        self.assertEqual(len(self.adapter.requests), 1)
+
+        self.open(headers={'Accept': 'application/json'})
+        self.assertEqual(len(self.adapter.requests), 2)
+
+        # Cookies are not part of the key by default.
+        self.browser.session.cookies.set('tracking', '1', domain='example.org')
+        self.open(headers={'Accept': 'application/json'})
+        self.assertEqual(len(self.adapter.requests), 2)
+
+    def test_cookies(self):
+        self.adapter.headers['Cache-Control'] = 'max-age=60'
+        self.browser.CACHE_KEY_COOKIES = ('session',)
+        self.browser.session.cookies.set('session', '1', domain='example.org')
+        self.browser.session.cookies.set('tracking', '1', domain='example.org')
+        self.open()
+
+        # A changed tracking cookie does not change the response.
+        self.browser.session.cookies.set('tracking', '2', domain='example.org')
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 1)
+
+        # Responses of another session are not used.
+        self.browser.session.cookies.set('session', 'other', domain='example.org')
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 2)
+
+        self.browser.session.cookies.clear()
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 3)
+
+    def test_fresh(self):
+        self.adapter.headers['Cache-Control'] = 'max-age=60'
+        self.open()
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 1)
+
+    def test_expires(self):
+        self.adapter.headers['Expires'] = 'Thu, 01 Dec 2050 16:00:00 GMT'
+        self.open()
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 1)
+
+        self.adapter.headers['Expires'] = 'Thu, 01 Dec 1994 16:00:00 GMT'
+        self.open('/other')
+        self.open('/other')
+        self.assertEqual(len(self.adapter.requests), 3)
+
+    def test_not_stored(self):
+        self.adapter.headers['Cache-Control'] = 'no-store, max-age=60'
+        self.open()
+        self.assertEqual(len(self.browser.cache), 0)
+
+        # Responses without freshness nor validator can not be reused.
+        self.adapter.headers = {}
+        self.open()
+        self.assertEqual(len(self.browser.cache), 0)
+
+    def test_revalidate(self):
+        self.adapter.headers['ETag'] = '"v1"'
+        self.adapter.not_modified = True
+        self.assertEqual(self.open().text, 'http://example.org/item')
+        response = self.open()
+        self.assertEqual(self.adapter.requests[-1].headers['If-None-Match'], '"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'http://example.org/item')
+        self.assertEqual(len(self.adapter.requests), 2)
+
+    def test_not_updatable(self):
+        self.adapter.headers['ETag'] = '"v1"'
+        self.browser.is_updatable = False
+        self.open()
+        self.open()
+        self.assertEqual(len(self.adapter.requests), 1)
+
+    def test_page(self):
+        self.adapter.headers['Cache-Control'] = 'max-age=60'
+        self.open(params={'page': 1})
+        response = self.open(params={'page': 1})
+        self.assertEqual(len(self.adapter.requests), 1)
+        self.assertIsInstance(response.page, ItemPage)
+
+    def test_sqlite(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'cache.sqlite')
+            self.adapter.headers['Cache-Control'] = 'max-age=60'
+            self.browser.cache = SQLiteCache(path)
+            self.open()
+
+            # Entries are kept between runs.
+            browser = CacheBrowser()
+            browser.cache = SQLiteCache(path)
+            browser.session.mount('http://', self.adapter)
+            self.assertEqual(browser.open_with_cache('/item').text, 'http://example.org/item')
+            self.assertEqual(len(self.adapter.requests), 1)
+
+            browser.cache.close()
+            self.browser.cache.close()
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase
+
+from lxml.html import fromstring
+
+from weboob.browser.elements import ElementEnv, ItemElement, ListElement, TableElement, _ElementMeta
+from weboob.browser.filters.standard import CleanText, Env, TableCell
+from weboob.capabilities.base import BaseObject, StringField
+
+
+class Thing(BaseObject):
+    label = StringField('Label')
+    kind = StringField('Kind')
+
+
+class FakePage(object):
+    logger = None
+    params = {}
+
+    def __init__(self, content):
+        self.doc = fromstring(content)
+
+
+class ThingList(ListElement):
+    item_xpath = '//li'
+
+    class item(ItemElement):
+        klass = Thing
+
+        load_kind = Env('kind', 'thing')
+
+        obj_id = CleanText('.')
+        obj_label = CleanText('.')
+
+        def obj_kind(self):
+            return self.loaders['kind']
+
+
+class ThingTable(TableElement):
+    head_xpath = '//tr[1]/th'
+    item_xpath = '//tr[td]'
+
+    col_label = u'Label'
+
+    class item(ItemElement):
+        klass = Thing
+
+        obj_id = CleanText(TableCell('label'))
+        obj_label = CleanText(TableCell('label'))
+
+
+class ElementTest(TestCase):
+    def test_list(self):
+        page = FakePage('<ul><li>a</li><li>b</li></ul>')
+        things = list(ThingList(page)())
+        self.assertEqual(['a', 'b'], [thing.label for thing in things])
+        self.assertEqual(['thing', 'thing'], [thing.kind for thing in things])
+
+    def test_table(self):
+        page = FakePage('<table><tr><th>Other</th><th>Label</th></tr><tr><td>1</td><td>a</td></tr></table>')
+        self.assertEqual(['a'], [thing.label for thing in ThingTable(page)()])
+
+    def test_introspect_once(self):
+        page = FakePage('<ul><li>a</li><li>b</li><li>c</li></ul>')
+        list(ThingList(page)())
+        generation = _ElementMeta.generation
+        introspection = ThingList.item.__dict__['_introspection']
+
+        # Nothing is found again for the next items and lists.
+        self.assertEqual(3, len(list(ThingList(page)())))
+        self.assertEqual(generation, _ElementMeta.generation)
+        self.assertIs(introspection, ThingList.item.__dict__['_introspection'])
+
+    def test_class_changed(self):
+        page = FakePage('<ul><li>a</li></ul>')
+
+        class ThingList2(ThingList):
+            pass
+
+        self.assertEqual(['thing'], [thing.kind for thing in ThingList2(page)()])
+
+        class item(ThingList.item):
+            load_kind = Env('kind', 'other')
+
+        ThingList2.item = item
+        self.assertEqual(['other'], [thing.kind for thing in ThingList2(page)()])
+
+
+class ElementEnvTest(TestCase):
+    def test_inherit(self):
+        parent = ElementEnv(params={'id': '1', 'ids': ['1']})
+        child = ElementEnv(parent)
+        self.assertEqual('1', child['id'])
+        self.assertEqual({'id': '1', 'ids': ['1']}, dict(child))
+
+        child['id'] = '2'
+        child['ids'].append('2')
+        del child['ids']
+        self.assertNotIn('ids', child)
+        self.assertEqual({'id': '1', 'ids': ['1']}, dict(parent))
+
+    def test_copy_on_write(self):
+        parent = ElementEnv(params={'id': '1'})
+        child = ElementEnv(parent)
+        parent['id'] = '2'
+        parent['label'] = 'foo'
+        self.assertEqual({'id': '1'}, dict(child))
+        self.assertEqual({'id': '2', 'label': 'foo'}, dict(parent))
@@ -18,10 +18,12 @@
 import datetime
 from decimal import Decimal
 from unittest import TestCase
+from lxml.etree import XPathEvalError
 from lxml.html import fromstring
 
-from weboob.browser.filters.html import FormValue, Link
-from weboob.browser.filters.standard import RawText
+from weboob.browser.filters.html import CSS, FormValue, Link
+from weboob.browser.filters.json import Dict
+from weboob.browser.filters.standard import CleanText, RawText
 
 
 class RawTextTest(TestCase):
@@ -88,3 +90,49 @@ class LinkTest(TestCase):
         e = fromstring('<a href="https://www.google.com/">Google</a>')
 
         self.assertEqual('https://www.google.com/', Link('//a')(e))
+
+
+class SelectorTest(TestCase):
+    def setUp(self):
+        self.e = fromstring('<div><p class="a b">foo</p><p class="b">bar</p></div>')
+
+    def test_xpath(self):
+        self.assertEqual('foo bar', CleanText('//p')(self.e))
+        self.assertEqual('bar', CleanText('//p[2]')(self.e))
+
+    def test_invalid_xpath(self):
+        self.assertRaises(XPathEvalError, CleanText('//p['), self.e)
+
+    def test_css(self):
+        self.assertEqual('foo', CleanText(CSS('p.a'))(self.e))
+        self.assertEqual('foo bar', CleanText(CSS('p.b'))(self.e))
+
+
+class DictTest(TestCase):
+    def setUp(self):
+        self.doc = {'accounts': [{'id': '1', 'balance': {'value': 42}}, {'id': '2'}]}
+
+    def test_path(self):
+        self.assertEqual('2', Dict('accounts/1/id')(self.doc))
+        self.assertEqual(42, Dict('accounts/0/balance/value')(self.doc))
+        self.assertEqual(None, Dict('accounts/1/balance/value', default=None)(self.doc))
+
+    def test_selector_changed(self):
+        f = Dict('accounts')
+        self.assertEqual(2, len(f(self.doc)))
+        self.assertEqual('1', f[0]['id'](self.doc))
+
+    def test_overridden(self):
+        class LowerDict(Dict):
+            @classmethod
+            def select(cls, selector, item, obj=None, key=None):
+                return super(LowerDict, cls).select([part.lower() for part in selector], item, obj, key)
+
+        self.assertEqual('2', LowerDict('ACCOUNTS/1/ID')(self.doc))
+
+        class UpperDict(Dict):
+            def filter(self, value):
+                return super(UpperDict, self).filter(value).upper()
+
+        self.doc['accounts'][0]['label'] = 'foo'
+        self.assertEqual('FOO', UpperDict('accounts/0/label')(self.doc))
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase
+
+from requests.models import Response
+
+from weboob.browser.elements import ListElement, ItemElement, method
+from weboob.browser.filters.standard import CleanText
+from weboob.browser.pages import CsvDocument, CsvPage, CsvRow, HTMLPage, JsonPage, LoggedPage, StreamingHTMLPage, StreamingXMLPage
+from weboob.capabilities.base import BaseObject
+from weboob.tools.compat import unicode
+
+
+class FakeBrowser(object):
+    logger = None
+
+
+class FakeRaw(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+
+    def stream(self, chunk_size, decode_content=True):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+def make_response(chunks, content_type='text/html; charset=utf-8', encoding=None):
+    response = Response()
+    response.status_code = 200
+    response.url = 'http://example.org/'
+    response.headers['Content-Type'] = content_type
+    response.raw = FakeRaw(chunks)
+    response.encoding = encoding
+    return response
+
+
+def iter_rows(count, size=1):
+    for i in range(0, count, size):
+        yield b''.join(b'<tr><td>%d</td><td>row</td></tr>' % j for j in range(i, min(i + size, count)))
+
+
+class Thing(BaseObject):
+    pass
+
+
+class ThingPage(StreamingHTMLPage):
+    @method
+    class iter_things(ListElement):
+        item_xpath = '//tr'
+
+        class item(ItemElement):
+            klass = Thing
+
+            obj_id = CleanText('./td[1]')
+
+
+class StreamingPageTest(TestCase):
+    def test_iter_xpath(self):
+        chunks = [b'<html><body><table>'] + list(iter_rows(100, 7)) + [b'</table></body></html>']
+        page = ThingPage(FakeBrowser(), make_response(chunks))
+        self.assertEqual([str(i) for i in range(100)], [thing.id for thing in page.iter_things()])
+
+    def test_lazy(self):
+        chunks = [b'<html><body><table>'] + list(iter_rows(1000)) + [b'</table></body></html>']
+        response = make_response(chunks)
+        page = ThingPage(FakeBrowser(), response)
+        things = page.iter_things()
+        self.assertEqual('0', next(things).id)
+        self.assertLess(response.raw.read, 500)
+
+    def test_memory_flat(self):
+        chunks = [b'<html><body><table>'] + list(iter_rows(10000, 10)) + [b'</table></body></html>']
+        page = ThingPage(FakeBrowser(), make_response(chunks))
+        sizes = []
+        count = 0
+        for el in page.iter_xpath('//tr'):
+            count += 1
+            if count % 1000 == 0:
+                sizes.append(sum(1 for _ in page.doc.iter()))
+        self.assertEqual(10000, count)
+        self.assertLess(max(sizes), 250)
+
+    def test_nested(self):
+        chunks = [b'<root><a><b>1</b>', b'<b>2</b></a>', b'<a><b>3</b></a>', b'</root>']
+        page = StreamingXMLPage(FakeBrowser(), make_response(chunks, 'text/xml'))
+        self.assertEqual([u'1', u'2', u'3'], [el.text for el in page.iter_xpath('//b')])
+
+        page = StreamingXMLPage(FakeBrowser(), make_response(chunks, 'text/xml'))
+        self.assertEqual(2, len(list(page.iter_xpath('//a'))))
+
+
+class TextJsonPage(JsonPage):
+    def build_doc(self, text):
+        return super(TextJsonPage, self).build_doc(text.replace(u'//', u''))
+
+
+class JsonPageTest(TestCase):
+    def test_data(self):
+        content = u'{"label": "\u00e9t\u00e9"}'.encode('utf-8')
+        page = JsonPage(FakeBrowser(), make_response([content], 'application/json'))
+        self.assertIsInstance(page.data, bytes)
+        self.assertEqual({u'label': u'\u00e9t\u00e9'}, page.doc)
+
+    def test_data_text(self):
+        # Pages overriding build_doc still get text.
+        content = u'//{"label": "\u00e9t\u00e9"}'.encode('utf-8')
+        page = TextJsonPage(FakeBrowser(), make_response([content], 'application/json'))
+        self.assertIsInstance(page.data, unicode)
+        self.assertEqual({u'label': u'\u00e9t\u00e9'}, page.doc)
+
+
+class CsvPageTest(TestCase):
+    content = b'date,label,amount\r\n2020-01-02, CB SHOP ,-10\r\n2020-01-03,SALARY,1000\r\n'
+
+    def make_pages(self, content=None, **attrs):
+        # Same page, parsed eagerly and lazily.
+        pages = []
+        for lazy in (False, True):
+            attrs['LAZY'] = lazy
+            klass = type('TestCsvPage', (CsvPage,), attrs)
+            pages.append(klass(FakeBrowser(), make_response([content or self.content], 'text/csv')))
+        return pages
+
+    def test_no_header(self):
+        eager, lazy = self.make_pages()
+        self.assertIsInstance(lazy.doc, CsvDocument)
+        self.assertEqual([[u'date', u'label', u'amount'],
+                          [u'2020-01-02', u'CB SHOP', u'-10'],
+                          [u'2020-01-03', u'SALARY', u'1000']], eager.doc)
+        self.assertEqual(eager.doc, list(lazy.doc))
+        self.assertEqual(eager.doc, lazy.doc.rows)
+        self.assertIsNone(lazy.doc.header)
+        # Rows are parsed again on each iteration.
+        self.assertEqual(list(lazy.doc), list(lazy.doc))
+        self.assertEqual(3, len(lazy.doc))
+        self.assertEqual(eager.doc[1], lazy.doc[1])
+
+    def test_header(self):
+        eager, lazy = self.make_pages(HEADER=1)
+        self.assertEqual([{u'date': u'2020-01-02', u'label': u'CB SHOP', u'amount': u'-10'},
+                          {u'date': u'2020-01-03', u'label': u'SALARY', u'amount': u'1000'}], eager.doc)
+        self.assertEqual(eager.doc, lazy.doc.dicts)
+        self.assertEqual([u'date', u'label', u'amount'], lazy.doc.header)
+        self.assertEqual([[u'2020-01-02', u'CB SHOP', u'-10'], [u'2020-01-03', u'SALARY', u'1000']], lazy.doc.rows)
+
+        row = lazy.doc[0]
+        self.assertIsInstance(row, CsvRow)
+        self.assertEqual(eager.doc[0], row)
+        self.assertEqual(u'CB SHOP', row[u'label'])
+        self.assertRaises(KeyError, lambda: row[u'currency'])
+        self.assertEqual(eager.doc, [dict(row) for row in lazy.doc])
+
+    def test_header_line(self):
+        content = b'Account statement\r\n' + self.content
+        eager, lazy = self.make_pages(content, HEADER=2)
+        self.assertEqual(2, len(eager.doc))
+        self.assertEqual(eager.doc, lazy.doc.dicts)
+        self.assertEqual([u'date', u'label', u'amount'], lazy.doc.header)
+
+    def test_short_row(self):
+        content = self.content + b'2020-01-04,RENT\r\n'
+        eager, lazy = self.make_pages(content, HEADER=1)
+        self.assertEqual({u'date': u'2020-01-04', u'label': u'RENT'}, eager.doc[-1])
+        self.assertEqual(eager.doc, lazy.doc.dicts)
+        self.assertEqual(2, len(lazy.doc[-1]))
+
+    def test_newlines_hack(self):
+        content = b'a,"b\r\nc"\rd,e\r\n'
+        for page in self.make_pages(content):
+            self.assertEqual([[u'a', u'b\nc'], [u'd', u'e']], list(page.doc))
+
+        content = b'a,"b\r\nc"\r\nd,e\r\n'
+        for page in self.make_pages(content, NEWLINES_HACK=False):
+            self.assertEqual([[u'a', u'b\r\nc'], [u'd', u'e']], list(page.doc))
+
+    def test_encoding(self):
+        content = u'\ufeffdate,label\r\n2020-01-02,\u00e9t\u00e9\r\n'.encode('utf-16le')
+        eager, lazy = self.make_pages(content, ENCODING='utf-16le', HEADER=1)
+        self.assertEqual([{u'date': u'2020-01-02', u'label': u'\u00e9t\u00e9'}], eager.doc)
+        self.assertEqual(eager.doc, lazy.doc.dicts)
+
+        content = b'date,label\r\n2020-01-02,\xa4\r\n'
+        eager, lazy = self.make_pages(content, ENCODING='iso-8859-15')
+        self.assertEqual([[u'date', u'label'], [u'2020-01-02', u'\u20ac']], eager.doc)
+        self.assertEqual(eager.doc, list(lazy.doc))
+
+
+class EncodingTest(TestCase):
+    def make_page(self, klass, content, encoding='iso-8859-1'):
+        return klass(FakeBrowser(), make_response([content], 'text/html', encoding))
+
+    def test_sniff_charset(self):
+        content = u'<html><head><meta charset="utf-8"></head><body>\u00e9t\u00e9</body></html>'.encode('utf-8')
+        page = self.make_page(HTMLPage, content)
+        self.assertEqual(u'utf-8', page.sniff_encoding())
+        self.assertEqual(u'utf-8', page.encoding)
+        self.assertEqual(u'\u00e9t\u00e9', page.doc.xpath('string(//body)'))
+
+    def test_sniff_http_equiv(self):
+        content = (b'<html><head><!-- <meta charset="utf-8"> -->'
+                   b'<meta http-equiv="Content-Type" content="text/html; charset=iso-8859-15">'
+                   b'</head><body>\xa4</body></html>')
+        page = self.make_page(HTMLPage, content, 'utf-8')
+        self.assertEqual(u'iso-8859-15', page.encoding)
+        self.assertEqual(u'\u20ac', page.doc.xpath('string(//body)'))
+
+    def test_sniff_large_head(self):
+        # The declaration may be after the sniffed bytes.
+        content = b'<html><head><title>' + b'x' * 5000 + b'</title></head></html>'
+        page = self.make_page(HTMLPage, content)
+        self.assertIsNone(page.sniff_encoding())
+
+        # Without a declaration in the head, the response encoding is used.
+        content = b'<html><head><title>x</title></head><body>\xe9</body></html>'
+        page = self.make_page(HTMLPage, content)
+        self.assertEqual(u'windows-1252', page.sniff_encoding())
+
+    def test_detected_encodings(self):
+        class CountPage(HTMLPage):
+            builds = 0
+
+            def sniff_encoding(self):
+                return None
+
+            def build_doc(self, content):
+                CountPage.builds += 1
+                return super(CountPage, self).build_doc(content)
+
+        content = u'<html><head><meta charset="utf-8"></head><body>\u00e9t\u00e9</body></html>'.encode('utf-8')
+        page = self.make_page(CountPage, content)
+        # The document is built again with the declared encoding.
+        self.assertEqual(2, CountPage.builds)
+        self.assertEqual(u'utf-8', page.encoding)
+        self.assertEqual(u'\u00e9t\u00e9', page.doc.xpath('string(//body)'))
+
+        # The encoding detected for the previous response is right.
+        CountPage.builds = 0
+        page = self.make_page(CountPage, content)
+        self.assertEqual(1, CountPage.builds)
+        self.assertEqual(u'\u00e9t\u00e9', page.doc.xpath('string(//body)'))
+
+        # It is wrong, the document is built again.
+        CountPage.builds = 0
+        content = b'<html><head><meta charset="iso-8859-15"></head><body>\xa4</body></html>'
+        page = self.make_page(CountPage, content)
+        self.assertEqual(2, CountPage.builds)
+        self.assertEqual(u'iso-8859-15', page.encoding)
+        self.assertEqual(u'\u20ac', page.doc.xpath('string(//body)'))
+
+
+class SharedDocTest(TestCase):
+    content = b'<html><head><meta charset="utf-8"></head><body>1;2</body></html>'
+
+    def make_pages(self, *klasses):
+        response = make_response([self.content])
+        response._shared_docs = {}
+        return [klass(FakeBrowser(), response) for klass in klasses]
+
+    def test_shared(self):
+        class FirstPage(HTMLPage):
+            pass
+
+        class SecondPage(LoggedPage, HTMLPage):
+            pass
+
+        first, second = self.make_pages(FirstPage, SecondPage)
+        self.assertIs(first.doc, second.doc)
+
+    def test_not_shared(self):
+        class BuildPage(HTMLPage):
+            def build_doc(self, content):
+                return super(BuildPage, self).build_doc(content.replace(b'1', b'3'))
+
+        class ChildPage(BuildPage):
+            pass
+
+        first, second, third = self.make_pages(HTMLPage, BuildPage, ChildPage)
+        self.assertIsNot(first.doc, second.doc)
+        self.assertIsNot(second.doc, third.doc)
+        self.assertEqual(u'3;2', second.doc.xpath('string(//body)'))
+
+    def test_csv(self):
+        class FirstPage(CsvPage):
+            pass
+
+        class SecondPage(CsvPage):
+            FMTPARAMS = {'delimiter': ';'}
+
+        first, second = self.make_pages(FirstPage, SecondPage)
+        self.assertEqual([1, 2], [len(first.doc[0]), len(second.doc[0])])
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Event, Lock
+from time import sleep
+from unittest import TestCase
+
+import requests
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.pages import HTMLPage
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """
+    Transport answering every request without network, and failing the
+    first request of urls listed in `fail`. Requests are blocked until
+    `ready` is set.
+    """
+
+    def __init__(self, fail=()):
+        super(FakeAdapter, self).__init__()
+        self.fail = set(fail)
+        self.requested = []
+        self.lock = Lock()
+        self.ready = Event()
+        self.ready.set()
+
+    def send(self, request, **kwargs):
+        self.ready.wait()
+        with self.lock:
+            self.requested.append(request.url)
+            if request.url in self.fail:
+                self.fail.remove(request.url)
+                raise requests.exceptions.ConnectionError('failed', request=request)
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers['Content-Type'] = 'text/html'
+        response._content = b'<html><body>%s</body></html>' % request.url.encode('ascii')
+        return response
+
+    def close(self):
+        pass
+
+
+class ItemPage(HTMLPage):
+    pass
+
+
+class MyBrowser(PagesBrowser):
+    BASEURL = 'http://example.org/'
+
+    item = URL(r'/item/(?P<id>\d+)', ItemPage)
+
+
+class PrefetchTest(TestCase):
+    def setUp(self):
+        self.browser = MyBrowser()
+
+    def tearDown(self):
+        self.browser.deinit()
+
+    def mount(self, **kwargs):
+        adapter = FakeAdapter(**kwargs)
+        self.browser.session.mount('http://', adapter)
+        return adapter
+
+    def test_reuse(self):
+        adapter = self.mount()
+        futures = self.browser.prefetch([self.browser.item.build(id=i) for i in range(3)])
+        for future in futures:
+            future.result()
+
+        for i in range(3):
+            self.assertIsInstance(self.browser.item.go(id=i), ItemPage)
+        self.assertEqual(len(adapter.requested), 3)
+        self.assertFalse(self.browser._prefetched)
+
+        # Each prefetched response is used once.
+        self.browser.item.go(id=0)
+        self.assertEqual(len(adapter.requested), 4)
+
+    def test_failed(self):
+        url = self.browser.item.build(id=1)
+        adapter = self.mount(fail=[url])
+        future, = self.browser.prefetch([url])
+        self.assertRaises(requests.exceptions.ConnectionError, future.result)
+        # Failed responses are not kept. Callbacks of the future may be run
+        # just after result() returns.
+        for _ in range(100):
+            if not self.browser._prefetched:
+                break
+            sleep(0.01)
+        self.assertFalse(self.browser._prefetched)
+
+        self.assertIsInstance(self.browser.item.go(id=1), ItemPage)
+        self.assertEqual(adapter.requested, [url, url])
+
+    def test_max(self):
+        self.mount()
+        self.browser.PREFETCH_MAX = 2
+        self.browser.prefetch([self.browser.item.build(id=i) for i in range(5)])
+        self.assertEqual(list(self.browser._prefetched),
+                         [self.browser.item.build(id=3), self.browser.item.build(id=4)])
+
+    def test_cancel(self):
+        # Dropped futures are cancelled before they are started, which runs
+        # their callbacks at once.
+        adapter = self.mount()
+        adapter.ready.clear()
+        self.browser.PREFETCH_MAX = 2
+        count = self.browser.MAX_WORKERS + 3
+        try:
+            futures = self.browser.prefetch([self.browser.item.build(id=i) for i in range(count)])
+        finally:
+            adapter.ready.set()
+        self.assertTrue(futures[count - 3].cancelled())
+        self.assertEqual(list(self.browser._prefetched),
+                         [self.browser.item.build(id=count - 2), self.browser.item.build(id=count - 1)])
@@ -19,7 +19,7 @@ from unittest import TestCase
 
 from weboob.browser import PagesBrowser, URL
 from weboob.browser.pages import Page
-from weboob.browser.url import UrlNotResolvable
+from weboob.browser.url import UrlNotResolvable, URLRouter
 
 
 class MyMockBrowserWithoutBrowser(object):
@@ -118,6 +118,22 @@ class URLTest(TestCase):
         res = self.myBrowser.urlSameParams.build(id=2, name="weboob")
         self.assertEquals(res, "http://test.com?id=2&name=weboob")
 
+    # Checks that build uses patterns added after the first build
+    def test_build_patterns_changed(self):
+        self.assertEquals(self.myBrowser.urlValue.build(id=2), "http://test.com/2")
+        self.myBrowser.urlValue.urls.insert(0, "http://test.net/(?P<id>\d+)")
+        self.assertEquals(self.myBrowser.urlValue.build(id=2), "http://test.net/2")
+
+    # Checks that templates are kept by each URL object, and not shared with
+    # other browsers
+    def test_build_templates_per_instance(self):
+        other = MyMockBrowser()
+        self.myBrowser.urlValue.urls[0] = "http://test.net/(?P<id>\d+)"
+        self.assertEquals(self.myBrowser.urlValue.build(id=2), "http://test.net/2")
+        self.assertEquals(other.urlValue.build(id=2), "http://test.com/2")
+        self.assertEquals(self.myBrowser.urlValue._templates[0], ("http://test.net/(?P<id>\d+)",))
+        self.assertIsNone(MyMockBrowser.urlValue._templates)
+
     # Checks that an exception is raised when a parameter is missing
     # (here, the parameter name)
     def test_build_urlParams_KO_missedparams(self):
@@ -135,3 +151,46 @@ class URLTest(TestCase):
         self.assertRaisesRegexp(AssertionError, "You can use this method" +
                                 " only if there is a Page class handler.",
                                 self.myBrowser.urlRegex.is_here, id=2)
+
+    # Check that the router only gives URLs with a Page class, starting from
+    # the first one matching
+    def test_router_candidates(self):
+        router = URLRouter.get(self.myBrowser._urls, self.myBrowser.BASEURL)
+        self.assertEqual(list(router.iter_candidates("http://free.fr/")),
+                         ['urlIsHereDifKlass'])
+        self.assertEqual(list(router.iter_candidates("http://weboob.org/news")),
+                         ['urlIsHere', 'urlIsHereDifKlass'])
+        self.assertEqual(list(router.iter_candidates("http://test.org/")), [])
+
+    # Check that the router is rebuilt when patterns are changed
+    def test_router_patterns_changed(self):
+        router = URLRouter.get(self.myBrowser._urls, self.myBrowser.BASEURL)
+        self.myBrowser.urlIsHereDifKlass.urls.insert(0, 'http://test.org/')
+        new_router = URLRouter.get(self.myBrowser._urls, self.myBrowser.BASEURL)
+        self.assertIsNot(router, new_router)
+        self.assertEqual(list(new_router.iter_candidates("http://test.org/")),
+                         ['urlIsHereDifKlass'])
+
+    # Check that patterns with group references are all tried in order, as
+    # groups are renamed and renumbered in the combined regexp
+    def test_router_group_references(self):
+        for pattern in (r'http://test.org/(?P<a>\w)(?P=a)',
+                        r'http://test.org/(?P<a>\w)\1',
+                        r'http://test.org/(a)?(?(1)b|c)'):
+            self.myBrowser.urlIsHereDifKlass.urls.insert(0, pattern)
+            router = URLRouter.get(self.myBrowser._urls, self.myBrowser.BASEURL)
+            self.assertIsNone(router.regex)
+            self.myBrowser.urlIsHereDifKlass.urls.pop(0)
+
+        # an escaped backslash followed by a digit is not a reference
+        self.myBrowser.urlIsHereDifKlass.urls.insert(0, r'http://test.org/\\1')
+        router = URLRouter.get(self.myBrowser._urls, self.myBrowser.BASEURL)
+        self.assertIsNotNone(router.regex)
+        self.assertEqual(list(router.iter_candidates("http://test.org/\\1")),
+                         ['urlIsHereDifKlass'])
+
+    # Check that only the most recently used routers are kept
+    def test_router_cache_bounded(self):
+        for i in range(URLRouter._cache.max_entries + 10):
+            URLRouter.get(self.myBrowser._urls, 'http://test%d.org/' % i)
+        self.assertEqual(len(URLRouter._cache), URLRouter._cache.max_entries)
@@ -18,10 +18,12 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 from functools import wraps
+from threading import Lock
 import re
 import requests
 
 from weboob.tools.compat import basestring, unquote
+from weboob.tools.lrudict import LimitedLRUDict
 from weboob.tools.regex_helper import normalize
 from weboob.tools.misc import to_unicode
 
@@ -54,6 +56,9 @@ class URL(object):
         self._creation_counter = URL._creation_counter
         URL._creation_counter += 1
 
+        self._regexes = None
+        self._templates = None
+
     def is_here(self, **kwargs):
         """
         Returns True if the current page of browser matches this URL.
@@ -127,33 +132,86 @@ class URL(object):
         """
         browser = kwargs.pop('browser', self.browser)
         params = kwargs.pop('params', None)
+        patterns, exact, partial = self.get_templates()
+
+        keys = frozenset(kwargs)
+        candidates = []
+        if keys in exact:
+            candidates.append(exact[keys])
+        for index, pattern, names, required in partial:
+            if required <= keys <= names:
+                candidates.append((index, pattern))
+                break
+
+        if not candidates:
+            raise UrlNotResolvable('Unable to resolve URL with %r. Available are %s' % (kwargs, ', '.join(patterns)))
+
+        _, url = min(candidates)
+        # only use full-name substitutions, to allow % in URLs
+        for key, value in kwargs.items():
+            url = url.replace('%%(%s)s' % key, to_unicode(value))
+
+        url = browser.absurl(url, base=True)
+        if params:
+            p = requests.models.PreparedRequest()
+            p.prepare_url(url, params)
+            url = p.url
+        return url
+
+    def get_templates(self):
+        """
+        Get the reverse templates of this object's regexps, used to build
+        urls.
+
+        Regexps are only parsed once, as long as patterns do not change.
+        Templates are indexed by the set of their arguments.
+
+        :returns: all templates, templates indexed by their arguments, and
+                  templates which can be used with only some of their
+                  arguments
+        :rtype: tuple
+        """
+        key = tuple(self.urls)
+        if self._templates is not None and self._templates[0] == key:
+            return self._templates[1]
+
         patterns = []
         for url in self.urls:
             patterns += normalize(url)
 
-        for pattern, _ in patterns:
-            url = pattern
-            # only use full-name substitutions, to allow % in URLs
-            args = kwargs.copy()
-            for key in list(args.keys()):  # need to use keys() because of pop()
-                search = '%%(%s)s' % key
-                if search in pattern:
-                    url = url.replace(search, to_unicode(args.pop(key)))
-            # if there are named substitutions left, ignore pattern
-            if re.search('%\([A-z_]+\)s', url):
-                continue
-            # if not all args were used
-            if len(args):
-                continue
+        exact = {}
+        partial = []
+        for index, (pattern, names) in enumerate(patterns):
+            names = frozenset(names)
+            # placeholders which do not look like names (for example those of
+            # unnamed groups) may be left in the url
+            required = frozenset(name for name in names if re.match(r'[A-z_]+$', name))
+            if required == names:
+                exact.setdefault(names, (index, pattern))
+            else:
+                partial.append((index, pattern, names, required))
 
-            url = browser.absurl(url, base=True)
-            if params:
-                p = requests.models.PreparedRequest()
-                p.prepare_url(url, params)
-                url = p.url
-            return url
+        templates = ([pattern for pattern, _ in patterns], exact, partial)
+        self._templates = (key, templates)
+        return templates
 
-        raise UrlNotResolvable('Unable to resolve URL with %r. Available are %s' % (kwargs, ', '.join([pattern for pattern, _ in patterns])))
+    def get_regexes(self, base):
+        """
+        Get the regexps of this object, relative to the given base url.
+
+        They are compiled once, as long as patterns and base do not change.
+
+        :rtype: list[:class:`str`]
+        """
+        key = (base, tuple(self.urls))
+        if self._regexes is None or self._regexes[0] != key:
+            regexes = []
+            for regex in self.urls:
+                if not re.match(r'^[\w\?]+://.*', regex):
+                    regex = re.escape(base).rstrip('/') + '/' + regex.lstrip('/')
+                regexes.append(regex)
+            self._regexes = (key, regexes, [re.compile(regex) for regex in regexes])
+        return self._regexes[1]
 
     def match(self, url, base=None):
         """
@@ -163,10 +221,9 @@ class URL(object):
             assert self.browser is not None
             base = self.browser.BASEURL
 
-        for regex in self.urls:
-            if not re.match(r'^[\w\?]+://.*', regex):
-                regex = re.escape(base).rstrip('/') + '/' + regex.lstrip('/')
-            m = re.match(regex, url)
+        self.get_regexes(base)
+        for regex in self._regexes[2]:
+            m = regex.match(url)
             if m:
                 return m
 
@@ -181,17 +238,24 @@ class URL(object):
 
         m = self.match(response.url)
         if m:
-            page = self.klass(self.browser, response, m.groupdict())
-            if hasattr(page, 'is_here'):
-                if callable(page.is_here):
-                    if page.is_here():
-                        return page
-                else:
-                    assert isinstance(page.is_here, basestring)
-                    if page.doc.xpath(page.is_here):
-                        return page
+            return self.build_page(response, m)
+
+    def build_page(self, response, match):
+        """
+        Get an instance of the klass for a response matching this object, or
+        None if the page rejects it with its `is_here` attribute.
+        """
+        page = self.klass(self.browser, response, match.groupdict())
+        if hasattr(page, 'is_here'):
+            if callable(page.is_here):
+                if page.is_here():
+                    return page
             else:
-                return page
+                assert isinstance(page.is_here, basestring)
+                if page.doc.xpath(page.is_here):
+                    return page
+        else:
+            return page
 
     def id2url(self, func):
         r"""
@@ -210,6 +274,88 @@ class URL(object):
         return inner
 
 
+class URLRouter(object):
+    """
+    Find which :class:`URL` objects of a browser may handle an url.
+
+    All regexps are combined in one, so the first matching :class:`URL` is
+    found with a single match. Routers of the most recently used sets of
+    patterns are kept, use :meth:`get` to get one.
+
+    :param urls: URL objects with a Page class, indexed by attribute name
+    :type urls: :class:`collections.OrderedDict`
+    :param base: base url of the browser
+    :type base: :class:`str`
+    """
+
+    _cache = LimitedLRUDict()
+    _cache_lock = Lock()
+
+    # Backreferences and conditional groups refer to groups by name or
+    # number, which are both changed when patterns are combined.
+    _GROUP_REFERENCE_RE = re.compile(r'\(\?P=|\(\?\(|(?<!\\)(?:\\\\)*\\\d')
+
+    def __init__(self, urls, base):
+        self.names = []
+        indexes = {}
+        parts = []
+        for name, url in urls.items():
+            if url.klass is None:
+                continue
+            for regex in url.get_regexes(base):
+                group = '_%d_%d' % (len(self.names), len(parts))
+                indexes[group] = len(self.names)
+                # Names of groups would conflict between patterns, and we only
+                # need to know which pattern matched.
+                parts.append('(?P<%s>%s)' % (group, re.sub(r'\(\?P<\w+>', '(?:', regex)))
+            self.names.append(name)
+
+        self.indexes = indexes
+        try:
+            if any(self._GROUP_REFERENCE_RE.search(part) for part in parts):
+                raise re.error('group references are not supported')
+            self.regex = re.compile('|'.join(parts))
+        except re.error:
+            # Try every URL in order.
+            self.regex = None
+
+    @classmethod
+    def get(cls, urls, base):
+        """
+        Get the router for these URL objects, built only if their patterns
+        have changed.
+        """
+        key = (base,) + tuple((name, url.klass is not None) + tuple(url.urls) for name, url in urls.items())
+        with cls._cache_lock:
+            try:
+                return cls._cache[key]
+            except KeyError:
+                pass
+
+        router = cls(urls, base)
+        with cls._cache_lock:
+            cls._cache[key] = router
+        return router
+
+    def iter_candidates(self, url):
+        """
+        Iter on names of the URL objects which may match the url, in
+        declaration order.
+
+        The first one is guaranteed to match, the others have to be checked.
+        """
+        if self.regex is None:
+            start = 0
+        else:
+            m = self.regex.match(url)
+            if m is None:
+                return
+            start = self.indexes[m.lastgroup]
+
+        for name in self.names[start:]:
+            yield name
+
+
 class BrowserParamURL(URL):
     """A URL that automatically fills some params from browser attributes.
 
@@ -18,6 +18,7 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from collections import OrderedDict
 from datetime import date, datetime
 from binascii import crc32
 import re
@@ -27,6 +28,7 @@ from weboob.capabilities.base import empty, find_object
 from weboob.exceptions import BrowserQuestion
 from weboob.tools.capabilities.bank.iban import is_iban_valid
 from weboob.tools.compat import unicode
+from weboob.tools.date import new_datetime
 
 from .base import BaseObject, Field, StringField, DecimalField, IntField, \
                   UserError, Currency, NotAvailable, EnumField, Enum
@@ -35,7 +37,7 @@ from .collection import CapCollection
 
 
 __all__ = [
-    'CapBank', 'BaseAccount', 'Account', 'Loan', 'Per', 'Transaction', 'AccountNotFound',
+    'CapBank', 'BaseAccount', 'Account', 'Loan', 'Per', 'Transaction', 'TransactionBatch', 'AccountNotFound',
     'AccountType', 'AccountOwnership',
     'CapBankWealth', 'Investment', 'Pocket',
     'CapBankTransfer', 'Transfer', 'Recipient',
@@ -480,17 +482,64 @@ class Transaction(BaseObject):
         :returns: an unique ID encoded in 8 length hexadecimal string (for example ``'a64e1bc9'``)
         :rtype: :class:`str`
         """
-        crc = crc32(unicode(self.date).encode('utf-8'))
-        crc = crc32(unicode(self.amount).encode('utf-8'), crc)
-        if not empty(self.raw):
-            label = self.raw
-        else:
-            label = self.label
+        return self.unique_ids([self], seen, account_id)[0]
 
-        crc = crc32(re.sub('[ ]+', ' ', label).encode("utf-8"), crc)
+    @classmethod
+    def unique_ids(cls, transactions, seen=None, account_id=None):
+        """
+        Get the unique IDs of several transactions at once, like calling
+        :meth:`unique_id` on each of them with the same parameters.
+
+        :param transactions: transactions
+        :type transactions: iter[:class:`Transaction`]
+        :rtype: list[:class:`str`]
+        """
+        def iter_rows():
+            for tr in transactions:
+                klass = tr.__class__
+                try:
+                    getter = _UNIQUE_ID_GETTERS[klass]
+                except KeyError:
+                    getter = _UNIQUE_ID_GETTERS[klass] = klass.fields_getter(('date', 'amount', 'raw', 'label'))
+                yield getter(tr)
+
+        return list(_iter_unique_ids(iter_rows(), seen, account_id))
+
+
+# Functions reading the fields used by unique IDs, for each transaction class.
+_UNIQUE_ID_GETTERS = {}
+
+
+_SPACES_RE = re.compile('[ ]+')
+
+
+def _iter_unique_ids(rows, seen=None, account_id=None):
+    """
+    Unique IDs of transactions given as (date, amount, raw, label) tuples,
+    see :meth:`Transaction.unique_id`.
+    """
+    if account_id is not None:
+        account_id = unicode(account_id).encode('utf-8')
+    normalize = _SPACES_RE.sub
+    # Transactions of a history share few dates, so the CRC of each one is
+    # only computed once.
+    date_crcs = {}
+
+    for tr_date, amount, raw, label in rows:
+        key = (tr_date.__class__, tr_date)
+        crc = date_crcs.get(key)
+        if crc is None:
+            crc = date_crcs[key] = crc32(unicode(tr_date).encode('utf-8'))
+        crc = crc32(unicode(amount).encode('utf-8'), crc)
+        if not empty(raw):
+            label = raw
+        if '  ' in label:
+            label = normalize(' ', label)
+
+        crc = crc32(label.encode("utf-8"), crc)
 
         if account_id is not None:
-            crc = crc32(unicode(account_id).encode('utf-8'), crc)
+            crc = crc32(account_id, crc)
 
         if seen is not None:
             while crc in seen:
@@ -498,7 +547,178 @@ class Transaction(BaseObject):
 
             seen.add(crc)
 
-        return "%08x" % (crc & 0xffffffff)
+        yield "%08x" % (crc & 0xffffffff)
+
+
+class TransactionBatch(object):
+    """
+    Transactions stored by columns, to handle a lot of them without building
+    a :class:`Transaction` object for each.
+
+    Backends returning very long histories can yield batches instead of
+    transactions from :meth:`CapBank.iter_history`, for example::
+
+        def iter_history(self, account):
+            return TransactionBatch.chunks(self.browser.iter_history(account))
+
+    Only the :attr:`COLUMNS` fields are kept. Iterating on a batch builds
+    transactions, for callers which do not know about batches.
+
+    >>> from decimal import Decimal
+    >>> batch = TransactionBatch()
+    >>> batch.add(date=date(2020, 1, 2), raw=u'CB SHOP', amount=Decimal('-10'))
+    >>> batch.add(date=date(2020, 1, 3), raw=u'SALARY', amount=Decimal('1000'))
+    >>> for tr in batch.sorted():
+    ...     print(tr.raw)
+    SALARY
+    CB SHOP
+    """
+
+    COLUMNS = ('date', 'rdate', 'amount', 'label', 'raw', 'type')
+
+    def __init__(self, columns=None, klass=Transaction, backend=None):
+        """
+        :param columns: values of each column, missing ones are filled with
+                        the default value of the field
+        :type columns: :class:`dict`
+        :param klass: class of the transactions
+        :param backend: name of the backend which returned the transactions
+        """
+        self.klass = klass
+        self.backend = backend
+        self.columns = OrderedDict((name, []) for name in self.COLUMNS)
+
+        if columns:
+            length = max(len(values) for values in columns.values())
+            for name in self.COLUMNS:
+                values = list(columns.get(name, ()))
+                if not values:
+                    values = [klass._fields[name].value] * length
+                elif len(values) != length:
+                    raise ValueError('Column %s has %d values instead of %d' % (name, len(values), length))
+                self.columns[name] = values
+
+    @classmethod
+    def chunks(cls, transactions, size=1000, **kwargs):
+        """
+        Group transactions into batches of `size` transactions.
+
+        :param transactions: transactions to group
+        :type transactions: iter[:class:`Transaction`]
+        :rtype: iter[:class:`TransactionBatch`]
+        """
+        batch = cls(**kwargs)
+        for transaction in transactions:
+            batch.append(transaction)
+            if len(batch) >= size:
+                yield batch
+                batch = cls(**kwargs)
+        if len(batch):
+            yield batch
+
+    def append(self, transaction):
+        """
+        Add the values of a :class:`Transaction` object.
+        """
+        for name, values in self.columns.items():
+            values.append(getattr(transaction, name))
+
+    def add(self, **values):
+        """
+        Add a transaction from the values of its fields, checked like when
+        they are set on a :class:`Transaction` object.
+        """
+        for name in values:
+            if name not in self.columns:
+                raise TypeError('Unknown column %s' % name)
+
+        for name, column in self.columns.items():
+            field = self.klass._fields[name]
+            value = values.get(name, field.value)
+            if not empty(value) and not field.accepts(value):
+                raise ValueError('Value for "%s" needs to be of type %r, not %r' % (name, field.resolve_types(), type(value)))
+            column.append(field.prepare(value))
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def __iter__(self):
+        for row in self.iter_rows():
+            yield self.make_transaction(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(len(self))[index])
+        return self.make_transaction(tuple(values[index] for values in self.columns.values()))
+
+    def make_transaction(self, row):
+        transaction = self.klass()
+        transaction.backend = self.backend
+        for name, value in zip(self.columns, row):
+            setattr(transaction, name, value)
+        return transaction
+
+    def iter_rows(self):
+        """
+        Iterate on the values of each transaction, in :attr:`COLUMNS` order.
+
+        :rtype: iter[tuple]
+        """
+        return zip(*self.columns.values())
+
+    def iter_dicts(self):
+        """
+        Iterate on the values of each transaction, by column name.
+
+        :rtype: iter[:class:`OrderedDict`]
+        """
+        names = list(self.columns)
+        for row in self.iter_rows():
+            yield OrderedDict(zip(names, row))
+
+    def take(self, indexes):
+        """
+        Get a new batch with the transactions at the given positions.
+        """
+        indexes = list(indexes)
+        batch = type(self)(klass=self.klass, backend=self.backend)
+        for name, values in self.columns.items():
+            batch.columns[name] = [values[i] for i in indexes]
+        return batch
+
+    def sorted(self):
+        """
+        Get a new batch sorted in reverse chronological order, like
+        :func:`weboob.tools.capabilities.bank.transactions.sorted_transactions`.
+        """
+        min_datetime = datetime.min
+        keys = [(tr_date, new_datetime(rdate) if rdate else min_datetime)
+                for tr_date, rdate in zip(self.columns['date'], self.columns['rdate'])]
+        return self.take(sorted(range(len(keys)), key=keys.__getitem__, reverse=True))
+
+    @classmethod
+    def merge(cls, *batches):
+        """
+        Merge batches already sorted in reverse chronological order, like
+        :func:`weboob.tools.capabilities.bank.transactions.merge_iterators`.
+        """
+        merged = cls(klass=batches[0].klass if batches else Transaction)
+        for batch in batches:
+            for name, values in batch.columns.items():
+                merged.columns[name].extend(values)
+        keys = list(zip(merged.columns['date'], merged.columns['rdate']))
+        # The sort is stable, so equal transactions keep the order of batches.
+        return merged.take(sorted(range(len(keys)), key=keys.__getitem__, reverse=True))
+
+    def unique_ids(self, seen=None, account_id=None):
+        """
+        Get the unique ID of each transaction, see :meth:`Transaction.unique_id`.
+
+        :rtype: list[:class:`str`]
+        """
+        columns = self.columns
+        return list(_iter_unique_ids(zip(columns['date'], columns['amount'], columns['raw'], columns['label']),
+                                     seen, account_id))
 
 
 class Investment(BaseObject):
@@ -726,7 +946,7 @@ class CapBank(CapCollection):
 
         :param account: account to get history
         :type account: :class:`Account`
-        :rtype: iter[:class:`Transaction`]
+        :rtype: iter[:class:`Transaction`] (or iter[:class:`TransactionBatch`])
         :raises: :class:`AccountNotFound`
         """
         raise NotImplementedError()
@@ -17,11 +17,13 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from operator import itemgetter
+import datetime
 import warnings
 import re
 from decimal import Decimal
-from copy import deepcopy, copy
+from copy import deepcopy
 import sys
 
 from weboob.tools.compat import unicode, long, with_metaclass, StrConv
@@ -180,6 +182,10 @@ class EmptyType(object):
     def __deepcopy__(self, memo):
         return self
 
+    def __reduce__(self):
+        # Unpickle as the module constant, to keep `is` checks working.
+        return repr(self)
+
     def __nonzero__(self):
         return False
 
@@ -245,6 +251,32 @@ class Capability(object):
     """
 
 
+def _find_types(name):
+    """
+    Find all the classes with the given name.
+    """
+    # the following is a (almost) copy/paste from
+    # https://stackoverflow.com/questions/11775460/lexical-cast-from-string-to-type
+    found = ()
+    q = deque([object])
+    while q:
+        t = q.popleft()
+        if t.__name__ == name:
+            found += (t,)
+        else:
+            try:
+                # keep looking!
+                q.extend(t.__subclasses__())
+            except TypeError:
+                # type.__subclasses__ needs an argument for
+                # whatever reason.
+                if t is type:
+                    continue
+                else:
+                    raise
+    return found
+
+
 class Field(object):
     """
     Field of a :class:`BaseObject` class.
@@ -271,12 +303,58 @@ class Field(object):
         self._creation_counter = Field._creation_counter
         Field._creation_counter += 1
 
+    # Resolved types, by :attr:`types`, shared by the copies of fields.
+    _resolved_types = {}
+
+    def resolve_types(self):
+        """
+        Get the accepted types, with type names replaced by the classes
+        having this name.
+
+        :rtype: tuple
+        """
+        types = ()
+        for v in self.types:
+            if isinstance(v, str):
+                types += _find_types(v)
+            else:
+                types += (v,)
+        Field._resolved_types[self.types] = types
+        return types
+
+    def accepts(self, value):
+        """
+        Check if value is an instance of the accepted types.
+
+        Type names are only resolved again when value does not match, in
+        case the class of value has been loaded since.
+        """
+        try:
+            types = Field._resolved_types[self.types]
+        except KeyError:
+            types = self.resolve_types()
+        else:
+            if isinstance(value, types):
+                return True
+            if not any(isinstance(v, str) for v in self.types):
+                return False
+            types = self.resolve_types()
+        return isinstance(value, types)
+
     def convert(self, value):
         """
         Convert value to the wanted one.
         """
         return value
 
+    def prepare(self, value):
+        """
+        Get the value to store in an object, once it has been checked.
+
+        Unlike :meth:`convert`, it is not reported as a conversion.
+        """
+        return value
+
 
 class IntField(Field):
     """
@@ -367,6 +445,13 @@ class EnumField(Field):
         return value
 
 
+_DELETED = object()
+
+# Default values which do not need to be copied for each object.
+_IMMUTABLE_TYPES = (type(None), bool, int, long, float, Decimal, unicode, bytes, str,
+                    datetime.date, datetime.time, datetime.timedelta, EmptyType)
+
+
 class _BaseObjectMeta(type):
     def __new__(cls, name, bases, attrs):
         fields = [(field_name, attrs.pop(field_name)) for field_name, obj in list(attrs.items()) if isinstance(obj, Field)]
@@ -379,6 +464,13 @@ class _BaseObjectMeta(type):
             new_class._fields = deepcopy(new_class._fields)
         new_class._fields.update(fields)
 
+        # Fields are shared by all objects of the class, which only store
+        # their values, in the same order.
+        new_class._field_index = dict((field_name, (i, field)) for i, (field_name, field) in enumerate(new_class._fields.items()))
+        new_class._defaults = [field.value for field in new_class._fields.values()]
+        new_class._mutable_defaults = [i for i, value in enumerate(new_class._defaults)
+                                       if not isinstance(value, _IMMUTABLE_TYPES) and not isinstance(value, type)]
+
         if new_class.__doc__ is None:
             new_class.__doc__ = ''
         for name, field in fields:
@@ -421,9 +513,22 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
     def __init__(self, id=u'', url=NotLoaded, backend=None):
         self.id = to_unicode(id) if id is not None else u''
         self.backend = backend
-        self._fields = deepcopy(self._fields)
+        self._values = self._new_values()
         self.__setattr__('url', url)
 
+    @classmethod
+    def _new_values(cls):
+        """
+        Values of the fields of a new object: the default ones.
+
+        :attr:`_fields` only describes the fields, and is shared by all
+        objects of the class.
+        """
+        values = list(cls._defaults)
+        for i in cls._mutable_defaults:
+            values[i] = deepcopy(values[i])
+        return values
+
     @property
     def fullid(self):
         """
@@ -447,10 +552,9 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
         return True
 
     def copy(self):
-        obj = copy(self)
-        obj._fields = copy(self._fields)
-        for k in obj._fields:
-            obj._fields[k] = copy(obj._fields[k])
+        obj = type(self).__new__(type(self))
+        obj.__dict__.update(self.__dict__)
+        obj._values = list(self._values)
         return obj
 
     def __deepcopy__(self, memo):
@@ -478,8 +582,36 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
 
         if hasattr(self, 'id') and self.id is not None:
             yield 'id', self.id
-        for name, field in self._fields.items():
-            yield name, field.value
+        for name, value in zip(self._fields, self._values):
+            if value is not _DELETED:
+                yield name, value
+
+    @classmethod
+    def fields_getter(cls, names):
+        """
+        Get a function returning the values of the given fields of an object
+        of this class, as a tuple.
+
+        It is faster than reading attributes one by one, when the same fields
+        of a lot of objects are needed.
+
+        :param names: names of the fields
+        :type names: list[:class:`str`]
+        :rtype: callable
+        """
+        names = tuple(names)
+        indexes = [cls._field_index[name][0] for name in names]
+        getter = itemgetter(*indexes)
+        if len(indexes) == 1:
+            getter = lambda values, getter=getter: (getter(values),)
+
+        def get(obj):
+            values = getter(obj._values)
+            if _DELETED in values:
+                # Raise the AttributeError of the deleted field.
+                return tuple(getattr(obj, name) for name in names)
+            return values
+        return get
 
     def __eq__(self, obj):
         if isinstance(obj, BaseObject):
@@ -488,17 +620,29 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
             return False
 
     def __getattr__(self, name):
-        if self._fields is not None and name in self._fields:
-            return self._fields[name].value
+        if name == '_values':
+            # Object created without calling __init__.
+            values = self._new_values()
+            object.__setattr__(self, '_values', values)
+            return values
+
+        try:
+            index, _ = self._field_index[name]
+        except KeyError:
+            value = _DELETED
         else:
+            value = self._values[index]
+
+        if value is _DELETED:
             raise AttributeError("'%s' object has no attribute '%s'" % (
                 self.__class__.__name__, name))
+        return value
 
     def __setattr__(self, name, value):
         try:
-            attr = (self._fields or {})[name]
+            index, attr = self._field_index[name]
         except KeyError:
-            if name not in dir(self) and not name.startswith('_'):
+            if not name.startswith('_') and name not in self.__dict__ and not hasattr(type(self), name):
                 warnings.warn('Creating a non-field attribute %s. Please prefix it with _' % name,
                               AttributeCreationWarning, stacklevel=2)
             object.__setattr__(self, name, value)
@@ -518,42 +662,21 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
                     # match the wanted following types, so we'll
                     # raise ValueError.
                     pass
-            from collections import deque
-            actual_types = ()
-            for v in attr.types:
-                if isinstance(v, str):
-                    # the following is a (almost) copy/paste from
-                    # https://stackoverflow.com/questions/11775460/lexical-cast-from-string-to-type
-                    q = deque([object])
-                    while q:
-                        t = q.popleft()
-                        if t.__name__ == v:
-                            actual_types += (t,)
-                        else:
-                            try:
-                                # keep looking!
-                                q.extend(t.__subclasses__())
-                            except TypeError:
-                                # type.__subclasses__ needs an argument for
-                                # whatever reason.
-                                if t is type:
-                                    continue
-                                else:
-                                    raise
-                else:
-                    actual_types += (v,)
-
-            if not isinstance(value, actual_types) and not empty(value):
+            if not empty(value) and not attr.accepts(value):
                 raise ValueError(
                     'Value for "%s" needs to be of type %r, not %r' % (
-                        name, actual_types, type(value)))
-            attr.value = value
+                        name, attr.resolve_types(), type(value)))
+            self._values[index] = attr.prepare(value)
 
     def __delattr__(self, name):
         try:
-            self._fields.pop(name)
+            index, _ = self._field_index[name]
         except KeyError:
             object.__delattr__(self, name)
+        else:
+            if self._values[index] is _DELETED:
+                raise AttributeError(name)
+            self._values[index] = _DELETED
 
     def to_dict(self):
         def iter_decorate(d):
@@ -567,7 +690,7 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
 
     def __getstate__(self):
         d = self.to_dict()
-        d.update((k, v) for k, v in self.__dict__.items() if k != '_fields')
+        d.update((k, v) for k, v in self.__dict__.items() if k != '_values')
         return d
 
     @classmethod
@@ -580,7 +703,7 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
         return self
 
     def __setstate__(self, state):
-        self._fields = deepcopy(self._fields)  # because yaml does not call __init__
+        self._values = self._new_values()  # because yaml does not call __init__
         for k in state:
             setattr(self, k, state[k])
 
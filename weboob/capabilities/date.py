@@ -35,14 +35,18 @@ class DateField(Field):
     def __init__(self, doc, **kwargs):
         super(DateField, self).__init__(doc, datetime.date, datetime.datetime, **kwargs)
 
+    def prepare(self, value):
+        # Force use of our date and datetime types, to fix bugs in python2
+        # with strftime on year<1900.
+        if type(value) is datetime.datetime:
+            value = new_datetime(value)
+        if type(value) is datetime.date:
+            value = new_date(value)
+        return value
+
     def __setattr__(self, name, value):
         if name == 'value':
-            # Force use of our date and datetime types, to fix bugs in python2
-            # with strftime on year<1900.
-            if type(value) is datetime.datetime:
-                value = new_datetime(value)
-            if type(value) is datetime.date:
-                value = new_date(value)
+            value = self.prepare(value)
         return object.__setattr__(self, name, value)
 
 
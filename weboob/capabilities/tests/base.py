@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from copy import copy, deepcopy
+import pickle
+from unittest import TestCase
+
+from weboob.capabilities.base import BaseObject, Field, IntField, NotLoaded, StringField
+
+
+class Thing(BaseObject):
+    label = StringField('Label')
+    count = IntField('Count', default=0)
+    tags = Field('Tags', list, default=[])
+
+
+class SubThing(Thing):
+    kind = StringField('Kind')
+
+
+class BaseObjectTest(TestCase):
+    def test_defaults(self):
+        thing = Thing()
+        self.assertIs(NotLoaded, thing.label)
+        self.assertEqual(0, thing.count)
+
+        # Mutable defaults are not shared between objects.
+        thing.tags.append(u'a')
+        self.assertEqual([], Thing().tags)
+
+    def test_getattr(self):
+        thing = Thing()
+        self.assertRaises(AttributeError, getattr, thing, 'unknown')
+        self.assertFalse(hasattr(thing, 'unknown'))
+
+        del thing.label
+        self.assertRaises(AttributeError, getattr, thing, 'label')
+        self.assertRaises(AttributeError, delattr, thing, 'label')
+        thing.label = u'foo'
+        self.assertEqual(u'foo', thing.label)
+
+        # Objects created without __init__ get the default values.
+        thing = Thing.__new__(Thing)
+        self.assertIs(NotLoaded, thing.label)
+        self.assertEqual(0, thing.count)
+
+    def test_iter_fields(self):
+        thing = SubThing(u'1')
+        thing.kind = u'foo'
+        self.assertEqual(['id', 'url', 'label', 'count', 'tags', 'kind'],
+                         [name for name, _ in thing.iter_fields()])
+        self.assertEqual(u'foo', dict(thing.iter_fields())['kind'])
+
+        del thing.count
+        self.assertEqual(['id', 'url', 'label', 'tags', 'kind'],
+                         [name for name, _ in thing.iter_fields()])
+
+    def test_copy(self):
+        thing = Thing(u'1')
+        thing.label = u'foo'
+        thing._private = 42
+
+        for new in (thing.copy(), copy(thing), deepcopy(thing)):
+            self.assertEqual(u'1', new.id)
+            self.assertEqual(u'foo', new.label)
+            self.assertEqual(42, new._private)
+            new.label = u'bar'
+            self.assertEqual(u'foo', thing.label)
+
+    def test_pickle(self):
+        thing = SubThing(u'1', backend=u'test')
+        thing.label = u'foo'
+        thing.tags = [u'a']
+        thing._private = 42
+
+        new = pickle.loads(pickle.dumps(thing))
+        self.assertIsInstance(new, SubThing)
+        self.assertEqual(thing.fullid, new.fullid)
+        self.assertEqual(list(thing.iter_fields()), list(new.iter_fields()))
+        self.assertEqual(42, new._private)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+from weboob.core.bcall import BackendsCall, CallErrors
+
+
+__all__ = ['AsyncBackendsCall', 'ado']
+
+
+class _LoopQueue(object):
+    """
+    Queue filled by backends threads and read from an event loop.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            # The loop is closed, nobody will read the item anymore.
+            pass
+
+    def get(self):
+        return self.queue.get()
+
+
+class AsyncBackendsCall(BackendsCall):
+    """
+    :class:`BackendsCall` to use from an :mod:`asyncio` event loop.
+
+    Backends still run on the :class:`weboob.core.bcall.BackendsPool`
+    threads, but results are delivered to the loop, so they can be read with
+    ``async for`` without blocking it:
+
+    >>> async with await weboob.ado('iter_accounts') as accounts: # doctest: +SKIP
+    ...     async for account in accounts:
+    ...         print(account)
+
+    Errors are raised as :class:`weboob.core.bcall.CallErrors` once every
+    backend has finished. Leaving the ``async with`` block stops the call.
+
+    It must be created from a coroutine running in the event loop.
+    """
+
+    def __init__(self, backends, function, *args, **kwargs):
+        try:
+            self.loop = asyncio.get_running_loop()
+        except AttributeError:
+            # Python < 3.7
+            self.loop = asyncio.get_event_loop()
+        super(AsyncBackendsCall, self).__init__(backends, function, *args, **kwargs)
+
+    def create_queue(self):
+        return _LoopQueue(self.loop)
+
+    def __aiter__(self):
+        with self.buffer_cond:
+            self.bounded = True
+        return self
+
+    async def __anext__(self):
+        while self.remaining > 0 and not self.stop_event.is_set():
+            try:
+                response = await asyncio.wait_for(self.responses.get(), self.get_time_left())
+            except asyncio.TimeoutError:
+                self.expire()
+                break
+
+            result = self._consume(response)
+            if result is not None:
+                return result
+
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise CallErrors(errors)
+        raise StopAsyncIteration()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+async def ado(self, function, *args, **kwargs):
+    """
+    Like :func:`weboob.core.ouiboube.WebNip.do`, but to use from an
+    :mod:`asyncio` event loop.
+
+    Backends are still called in the :attr:`pool` threads, and results are
+    read with ``async for`` without blocking the loop.
+
+    It is available as the ``ado`` method of
+    :class:`weboob.core.ouiboube.WebNip` on Python 3.
+
+    :rtype: A :class:`AsyncBackendsCall` object (asynchronous iterable)
+    """
+    backends = self._pop_call_backends(kwargs)
+    deadline = kwargs.pop('deadline', None)
+    return AsyncBackendsCall(backends, function, *args, pool=self.pool, deadline=deadline, **kwargs)
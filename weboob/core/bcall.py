@@ -18,8 +18,10 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from collections import deque
 from copy import copy
-from threading import Thread, Event
+from threading import Thread, Event, Condition, Lock
+from time import time
 try:
     import Queue
 except ImportError:
@@ -27,11 +29,11 @@ except ImportError:
 
 from weboob.capabilities.base import BaseObject
 from weboob.tools.compat import basestring
-from weboob.tools.misc import get_backtrace
+from weboob.tools.misc import get_backtrace, deadline_scope
 from weboob.tools.log import getLogger
 
 
-__all__ = ['BackendsCall', 'CallErrors']
+__all__ = ['BackendsCall', 'BackendsPool', 'CallErrors', 'CallTimeout']
 
 
 class CallErrors(Exception):
@@ -47,27 +49,268 @@ class CallErrors(Exception):
         return self.errors.__iter__()
 
 
+class CallTimeout(Exception):
+    """
+    Reported in :class:`CallErrors` for a backend which has not finished
+    before the deadline of the call.
+    """
+
+    def __init__(self, backend):
+        super(CallTimeout, self).__init__('Backend %s has not finished before the deadline' % backend.name)
+        self.backend = backend
+
+
+class BackendsPool(object):
+    """
+    Pool of worker threads shared by every :class:`BackendsCall`.
+
+    Threads are started on demand, up to *max_workers*, and are reused by
+    the next calls instead of spawning one thread per backend each time.
+    Tasks waiting for their consumer (see :meth:`task_blocked`) do not count
+    against these limits, so calls done by the consumer are still run.
+
+    :param max_workers: maximum number of threads running backends at once
+    :type max_workers: :class:`int`
+    :param module_limits: maximum number of backends of a given module
+                          running at once, indexed by module name
+    :type module_limits: :class:`dict`
+    """
+
+    MAX_WORKERS = 32
+
+    def __init__(self, max_workers=None, module_limits=None):
+        self.logger = getLogger('bcall.pool')
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.module_limits = dict(module_limits or {})
+
+        self.cond = Condition()
+        self.pending = deque()
+        self.running = {}
+        self.workers = []
+        self.idle = 0
+        self.blocked = 0
+        self.closed = False
+
+    def set_module_limit(self, module_name, limit):
+        """
+        Set the maximum number of backends of a module running at once.
+
+        :param module_name: name of the module
+        :type module_name: :class:`str`
+        :param limit: maximum number of concurrent tasks, or None for no limit
+        :type limit: :class:`int`
+        """
+        with self.cond:
+            if limit is None:
+                self.module_limits.pop(module_name, None)
+            else:
+                self.module_limits[module_name] = limit
+            self.cond.notify_all()
+
+    def submit(self, backend, function, *args):
+        """
+        Schedule a call of *function* with *args*, accounted to *backend*.
+        """
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('Pool is shut down')
+
+            self.pending.append((backend.NAME, function, args))
+            self._start_worker()
+            self.cond.notify()
+
+    def _start_worker(self):
+        # Must be called with self.cond acquired.
+        if len(self.pending) > self.idle and len(self.workers) - self.blocked < self.max_workers:
+            thread = Thread(target=self._worker_run, name='bcall-worker-%d' % len(self.workers))
+            thread.daemon = True
+            self.workers.append(thread)
+            thread.start()
+
+    def task_blocked(self, backend):
+        """
+        Tell that a running task of *backend* waits for the consumer of its
+        results. Its thread and module slot are given to pending tasks until
+        :meth:`task_unblocked` is called, as the consumer may be waiting for
+        one of them.
+        """
+        with self.cond:
+            self.blocked += 1
+            self.running[backend.NAME] -= 1
+            self._start_worker()
+            self.cond.notify_all()
+
+    def task_unblocked(self, backend):
+        """
+        Tell that a task given to :meth:`task_blocked` runs again.
+        """
+        with self.cond:
+            self.blocked -= 1
+            self.running[backend.NAME] += 1
+
+    def _pop_task(self):
+        # Must be called with self.cond acquired.
+        for i, task in enumerate(self.pending):
+            module_name = task[0]
+            limit = self.module_limits.get(module_name)
+            if limit is None or self.running.get(module_name, 0) < limit:
+                del self.pending[i]
+                self.running[module_name] = self.running.get(module_name, 0) + 1
+                return task
+        return None
+
+    def _worker_run(self):
+        while True:
+            with self.cond:
+                task = self._pop_task()
+                while task is None:
+                    if self.closed:
+                        return
+                    self.idle += 1
+                    self.cond.wait()
+                    self.idle -= 1
+                    task = self._pop_task()
+
+            module_name, function, args = task
+            try:
+                function(*args)
+            except Exception:
+                self.logger.exception('Unhandled error in %s task', module_name)
+            finally:
+                with self.cond:
+                    self.running[module_name] -= 1
+                    # A task of the same module may be waiting for this slot.
+                    self.cond.notify_all()
+
+    def shutdown(self, wait=True):
+        """
+        Stop worker threads once pending tasks are done.
+
+        :param wait: if True, wait until all threads are stopped.
+        :type wait: bool
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+            workers = list(self.workers)
+
+        if wait:
+            for thread in workers:
+                thread.join()
+
+
+_default_pool = None
+
+
+def get_default_pool():
+    """
+    Get the pool used by :class:`BackendsCall` objects created without one.
+    """
+    global _default_pool
+    if _default_pool is None or _default_pool.closed:
+        _default_pool = BackendsPool()
+    return _default_pool
+
+
+class _Finished(object):
+    """
+    Marker put in the responses queue when a backend has returned, or when the
+    call is stopped, so consumers are woken up without polling.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+
 class BackendsCall(object):
+    """
+    Call a method on several backends at once.
+
+    While results are consumed, each backend can store at most
+    :attr:`BUFFER_SIZE` results which have not been read yet; past that, it
+    is blocked until the consumer catches up. As a backend keeps its lock
+    meanwhile, the limit is lifted when another call needs the same backend
+    (see :meth:`unblock_backend`). Stopping the call closes the backends'
+    iterators, so they stop fetching more pages.
+
+    When a deadline is given, requests done by backends are timed out
+    accordingly, and backends which have not finished in time are reported
+    with a :class:`CallTimeout` error, without holding the results of the
+    other ones.
+    """
+
+    BUFFER_SIZE = 20
+
+    # Calls which have not finished to run a backend, indexed by backend name.
+    _running = {}
+    _running_lock = Lock()
+
+    @classmethod
+    def unblock_backend(cls, backend):
+        """
+        Let the calls running *backend* store all their results without
+        waiting for their consumer, so they release the backend lock as soon
+        as possible.
+
+        It must be called before waiting for the backend lock, as the
+        consumer of a running call may be the one waiting for it, for
+        example when it looks up objects of a backend while iterating on its
+        results.
+        """
+        with cls._running_lock:
+            calls = list(cls._running.get(backend.name, ()))
+        for call in calls:
+            with call.buffer_cond:
+                call.unbounded.add(backend.name)
+                call.buffer_cond.notify_all()
+
     def __init__(self, backends, function, *args, **kwargs):
         """
         :param backends: List of backends to call
         :type backends: list[:class:`Module`]
         :param function: backends' method name, or callable object.
         :type function: :class:`str` or :class:`callable`
+        :param pool: pool of threads running the backends (keyword only,
+                     default is :func:`get_default_pool`)
+        :type pool: :class:`BackendsPool`
+        :param deadline: number of seconds given to backends to finish
+                         (keyword only)
+        :type deadline: :class:`float`
         """
         self.logger = getLogger('bcall')
 
-        self.responses = Queue.Queue()
+        self.pool = pool = kwargs.pop('pool', None) or get_default_pool()
+        deadline = kwargs.pop('deadline', None)
+        self.deadline = time() + deadline if deadline is not None else None
+
+        self.responses = self.create_queue()
         self.errors = []
         self.tasks = Queue.Queue()
         self.stop_event = Event()
-        self.threads = []
-
-        for backend in backends:
-            t = Thread(target=self.backend_process, args=(function, args, kwargs))
-            t.start()
-            self.threads.append(t)
+        self.backends = list(backends)
+        self.remaining = len(self.backends)
+        self.finished = set()
+
+        # Number of results stored by each backend and not consumed yet.
+        self.buffered = {}
+        self.buffer_cond = Condition()
+        self.bounded = False
+        # Backends which are not limited by BUFFER_SIZE anymore.
+        self.unbounded = set()
+
+        for backend in self.backends:
+            self.unblock_backend(backend)
+            with self._running_lock:
+                self._running.setdefault(backend.name, set()).add(self)
             self.tasks.put(backend)
+            self.buffered[backend.name] = 0
+            pool.submit(backend, self.backend_process, backend, function, args, kwargs)
+
+    def create_queue(self):
+        """
+        Create the queue where backends put their results.
+        """
+        return Queue.Queue()
 
     def store_result(self, backend, result):
         """Store the result when a backend task finished."""
@@ -76,16 +319,38 @@ class BackendsCall(object):
 
         if isinstance(result, BaseObject):
             result.backend = backend.name
-        self.responses.put(result)
+        elif hasattr(result, 'iter_dicts'):
+            # Batch of objects, which are built with its backend.
+            result.backend = backend.name
 
-    def backend_process(self, function, args, kwargs):
+        with self.buffer_cond:
+            if self._buffer_full(backend):
+                # Do not hold a slot of the pool while the consumer, which
+                # may wait for other calls, has not read the results.
+                self.pool.task_blocked(backend)
+                try:
+                    while self._buffer_full(backend):
+                        self.buffer_cond.wait()
+                finally:
+                    self.pool.task_unblocked(backend)
+            if self.stop_event.is_set():
+                return
+            self.buffered[backend.name] += 1
+        self.responses.put((backend.name, result))
+
+    def _buffer_full(self, backend):
+        # Must be called with self.buffer_cond acquired.
+        return self.bounded and self.buffered[backend.name] >= self.BUFFER_SIZE \
+            and backend.name not in self.unbounded and not self.stop_event.is_set()
+
+    def backend_process(self, backend, function, args, kwargs):
         """
         Internal method to run a method of a backend.
 
-        As this method may be blocking, it should be run on its own thread.
+        As this method may be blocking, it is run by a :class:`BackendsPool`
+        worker thread.
         """
-        backend = self.tasks.get()
-        with backend:
+        with backend, deadline_scope(self.deadline):
             try:
                 # Call method on backend
                 try:
@@ -109,20 +374,85 @@ class BackendsCall(object):
                                     break
                         except Exception as error:
                             self.errors.append((backend, error, get_backtrace(error)))
+                        finally:
+                            # Let a generator run its cleanup now, so it does
+                            # not fetch anything more once the call is stopped.
+                            if hasattr(result, 'close'):
+                                result.close()
                     else:
                         self.store_result(backend, result)
             finally:
+                with self._running_lock:
+                    calls = self._running[backend.name]
+                    calls.discard(self)
+                    if not calls:
+                        del self._running[backend.name]
+                self.finished.add(backend.name)
+                self.responses.put(_Finished(backend))
                 self.tasks.task_done()
 
-    def _callback_thread_run(self, callback, errback, finishback):
-        while not self.stop_event.is_set() and (self.tasks.unfinished_tasks or not self.responses.empty()):
+    def _iter_responses(self):
+        """
+        Yield results as soon as they are stored, until every backend has
+        finished or the call is stopped.
+        """
+        with self.buffer_cond:
+            self.bounded = True
+
+        while self.remaining > 0 and not self.stop_event.is_set():
             try:
-                response = self.responses.get(timeout=0.1)
+                response = self.responses.get(timeout=self.get_time_left())
             except Queue.Empty:
-                continue
-            else:
-                if callback:
-                    callback(response)
+                self.expire()
+                break
+
+            result = self._consume(response)
+            if result is not None:
+                yield result
+
+    def get_time_left(self):
+        """
+        Get the number of seconds left before the deadline, or None.
+        """
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time())
+
+    def expire(self):
+        """
+        Report backends which are still running as timed out, and stop the
+        call.
+        """
+        for backend in self.backends:
+            if backend.name not in self.finished:
+                self.logger.debug('%s: deadline reached', backend)
+                self.errors.append((backend, CallTimeout(backend), ''))
+        self.stop()
+
+    def _consume(self, response):
+        """
+        Account for an item taken from the responses queue.
+
+        :returns: the result stored by a backend, or None if the item is only
+                  a marker
+        """
+        if isinstance(response, _Finished):
+            # A backend without marker means that stop() was called, and
+            # stop_event is already set.
+            if response.backend is not None:
+                self.remaining -= 1
+            return None
+
+        backend_name, result = response
+        with self.buffer_cond:
+            self.buffered[backend_name] -= 1
+            self.buffer_cond.notify_all()
+        return result
+
+    def _callback_thread_run(self, callback, errback, finishback):
+        for response in self._iter_responses():
+            if callback:
+                callback(response)
 
         # Raise errors
         while errback and self.errors:
@@ -151,8 +481,20 @@ class BackendsCall(object):
 
     def wait(self):
         """Wait until all tasks are finished."""
-        for thread in self.threads:
-            thread.join()
+        with self.buffer_cond:
+            # Nobody reads results anymore, do not block backends.
+            self.bounded = False
+            self.buffer_cond.notify_all()
+
+        with self.tasks.all_tasks_done:
+            while self.tasks.unfinished_tasks:
+                time_left = self.get_time_left()
+                if time_left == 0:
+                    break
+                self.tasks.all_tasks_done.wait(time_left)
+
+        if self.tasks.unfinished_tasks:
+            self.expire()
 
         if self.errors:
             raise CallErrors(self.errors)
@@ -166,17 +508,17 @@ class BackendsCall(object):
         """
 
         self.stop_event.set()
+        self.responses.put(_Finished())
+        with self.buffer_cond:
+            self.buffer_cond.notify_all()
 
         if wait:
             self.wait()
 
     def __iter__(self):
         try:
-            while not self.stop_event.is_set() and (self.tasks.unfinished_tasks or not self.responses.empty()):
-                try:
-                    yield self.responses.get(timeout=0.1)
-                except Queue.Empty:
-                    continue
+            for response in self._iter_responses():
+                yield response
         except:
             self.stop()
             raise
@@ -19,8 +19,9 @@
 
 
 import os
+import sys
 
-from weboob.core.bcall import BackendsCall
+from weboob.core.bcall import BackendsCall, BackendsPool
 from weboob.core.modules import ModulesLoader, RepositoryModulesLoader
 from weboob.core.backendscfg import BackendsConfig
 from weboob.core.requests import RequestsManager
@@ -32,6 +33,9 @@ from weboob.tools.config.iconfig import ConfigError
 from weboob.tools.log import getLogger
 from weboob.exceptions import ModuleLoadError
 
+if sys.version_info.major > 2:
+    from weboob.core.abcall import ado as _ado
+
 
 __all__ = ['WebNip', 'Weboob']
 
@@ -59,10 +63,13 @@ class WebNip(object):
     :type storage: :class:`weboob.tools.storage.IStorage`
     :param scheduler: what scheduler to use; default is :class:`weboob.core.scheduler.Scheduler`
     :type scheduler: :class:`weboob.core.scheduler.IScheduler`
+    :param pool: pool of threads used to call backends; default is a
+                 :class:`weboob.core.bcall.BackendsPool` owned by this object
+    :type pool: :class:`weboob.core.bcall.BackendsPool`
     """
     VERSION = '2.1'
 
-    def __init__(self, modules_path=None, storage=None, scheduler=None):
+    def __init__(self, modules_path=None, storage=None, scheduler=None, pool=None):
         self.logger = getLogger('weboob')
         self.backend_instances = {}
         self.requests = RequestsManager()
@@ -83,6 +90,11 @@ class WebNip(object):
             scheduler = Scheduler()
         self.scheduler = scheduler
 
+        self._own_pool = pool is None
+        if pool is None:
+            pool = BackendsPool()
+        self.pool = pool
+
         self.storage = storage
 
     def __deinit__(self):
@@ -94,6 +106,8 @@ class WebNip(object):
         properly unload all correctly.
         """
         self.unload_backends()
+        if self._own_pool:
+            self.pool.shutdown(wait=False)
 
     def build_backend(self, module_name, params=None, storage=None, name=None, nofail=False, logger=None):
         """
@@ -220,6 +234,7 @@ class WebNip(object):
         for _, backend in sorted(self.backend_instances.items()):
             if (caps is None or backend.has_caps(caps)) and \
                (module is None or backend.NAME == module):
+                BackendsCall.unblock_backend(backend)
                 with backend:
                     yield backend
 
@@ -247,7 +262,31 @@ class WebNip(object):
         :type backends: list[:class:`str`]
         :param caps: iterate on backends which implement this caps
         :type caps: list[:class:`weboob.capabilities.base.Capability`]
+        :param deadline: number of seconds given to backends to finish; the
+                         ones still running are reported with a
+                         :class:`weboob.core.bcall.CallTimeout` error
+        :type deadline: :class:`float`
         :rtype: A :class:`weboob.core.bcall.BackendsCall` object (iterable)
+
+        Backends are run by the :attr:`pool` worker threads, so at most
+        :attr:`BackendsPool.max_workers` of them are called at once.
+        """
+        backends = self._pop_call_backends(kwargs)
+        deadline = kwargs.pop('deadline', None)
+
+        # The return value MUST BE the BackendsCall instance. Please never iterate
+        # here on this object, because caller might want to use other methods, like
+        # wait() on callback_thread().
+        # Thanks a lot.
+        return BackendsCall(backends, function, *args, pool=self.pool, deadline=deadline, **kwargs)
+
+    if sys.version_info.major > 2:
+        ado = _ado
+
+    def _pop_call_backends(self, kwargs):
+        """
+        Get backends to call according to the *backends* and *caps* parameters
+        of :func:`do`, which are removed from *kwargs*.
         """
         backends = list(self.backend_instances.values())
         _backends = kwargs.pop('backends', None)
@@ -277,11 +316,7 @@ class WebNip(object):
             caps = kwargs.pop('caps')
             backends = [backend for backend in backends if backend.has_caps(caps)]
 
-        # The return value MUST BE the BackendsCall instance. Please never iterate
-        # here on this object, because caller might want to use other methods, like
-        # wait() on callback_thread().
-        # Thanks a lot.
-        return BackendsCall(backends, function, *args, **kwargs)
+        return backends
 
     def schedule(self, interval, function, *args):
         """
@@ -348,11 +383,13 @@ class Weboob(WebNip):
     :type backends_filename: str
     :param storage: provide a storage where backends can save data
     :type storage: :class:`weboob.tools.storage.IStorage`
+    :param pool: pool of threads used to call backends
+    :type pool: :class:`weboob.core.bcall.BackendsPool`
     """
     BACKENDS_FILENAME = 'backends'
 
-    def __init__(self, workdir=None, datadir=None, backends_filename=None, scheduler=None, storage=None):
-        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage)
+    def __init__(self, workdir=None, datadir=None, backends_filename=None, scheduler=None, storage=None, pool=None):
+        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage, pool=pool)
 
         # Create WORKDIR
         if workdir is None:
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from threading import Event
+from unittest import TestCase
+
+from weboob.core.abcall import AsyncBackendsCall, ado
+from weboob.core.bcall import BackendsPool, CallErrors, CallTimeout
+from weboob.core.ouiboube import WebNip
+from weboob.core.tests.bcall import FakeBackend
+from weboob.tools.log import getLogger
+
+
+class FakeWeboob(object):
+    logger = getLogger('weboob')
+    _pop_call_backends = WebNip._pop_call_backends
+    ado = ado
+
+    def __init__(self, pool, backends):
+        self.pool = pool
+        self.backend_instances = dict((backend.name, backend) for backend in backends)
+
+
+class AsyncBackendsCallTest(TestCase):
+    def setUp(self):
+        self.pool = BackendsPool()
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    def iter_blocked(self, backend):
+        yield backend.name
+        self.release.wait(5)
+
+    def test_iter(self):
+        weboob = FakeWeboob(self.pool, [FakeBackend('b1'), FakeBackend('b2')])
+
+        async def run():
+            async with await weboob.ado('iter_things', 3) as things:
+                return sorted([thing async for thing in things])
+
+        self.assertEqual(asyncio.run(run()), [0, 0, 1, 1, 2, 2])
+
+    def test_deadline(self):
+        backends = [FakeBackend('b1'), FakeBackend('b2')]
+
+        async def run():
+            results = []
+            call = AsyncBackendsCall(backends, lambda backend: backend.name == 'b1' or self.release.wait(5),
+                                     pool=self.pool, deadline=0.2)
+            try:
+                async for result in call:
+                    results.append(result)
+            except CallErrors as e:
+                return results, list(e)
+
+        results, errors = asyncio.run(run())
+        self.assertEqual(results, [True])
+        (backend, error, _), = errors
+        self.assertIs(backend, backends[1])
+        self.assertIsInstance(error, CallTimeout)
+
+    def test_closed_loop(self):
+        async def run():
+            call = AsyncBackendsCall([FakeBackend('b1')], self.iter_blocked, pool=self.pool)
+            async for result in call:
+                return call
+
+        call = asyncio.run(run())
+        # The backend still stores results after the loop is closed.
+        self.release.set()
+        with call.tasks.all_tasks_done:
+            if call.tasks.unfinished_tasks:
+                call.tasks.all_tasks_done.wait(5)
+        self.assertEqual(call.tasks.unfinished_tasks, 0)
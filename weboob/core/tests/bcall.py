@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Event, RLock, Thread, current_thread
+from time import time
+from unittest import TestCase
+
+import requests
+
+from weboob.browser import Browser
+from weboob.capabilities.bank import Transaction, TransactionBatch
+from weboob.core.bcall import BackendsCall, BackendsPool, CallErrors, CallTimeout
+from weboob.tools.misc import deadline_scope, get_time_left
+
+
+class FakeBackend(object):
+    NAME = 'fake'
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = RLock()
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, t, v, tb):
+        self.lock.release()
+
+    def get_thread(self):
+        return current_thread()
+
+    def iter_things(self, count):
+        for i in range(count):
+            yield i
+
+    def get_thing(self, i):
+        return i
+
+
+class WakeupTest(TestCase):
+    def setUp(self):
+        self.pool = BackendsPool()
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    def iter_blocked(self, backend):
+        yield 1
+        self.release.wait(5)
+        yield 2
+
+    def test_iter(self):
+        it = iter(BackendsCall([FakeBackend('b1')], self.iter_blocked, pool=self.pool))
+        # The first result is read while the backend is still running.
+        self.assertEqual(next(it), 1)
+        self.release.set()
+        self.assertEqual(list(it), [2])
+
+    def test_callback_thread(self):
+        received = Event()
+        finished = Event()
+        call = BackendsCall([FakeBackend('b1')], self.iter_blocked, pool=self.pool)
+        call.callback_thread(lambda result: received.set(), finishback=finished.set)
+        self.assertTrue(received.wait(5))
+        self.assertFalse(finished.is_set())
+        self.release.set()
+        self.assertTrue(finished.wait(5))
+
+
+class BufferTest(TestCase):
+    def setUp(self):
+        self.pool = BackendsPool()
+
+    def tearDown(self):
+        self.pool.shutdown(wait=False)
+
+    def run_in_thread(self, function):
+        result = []
+        thread = Thread(target=lambda: result.append(function()))
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), 'call is blocked')
+        return result[0]
+
+    def test_bounded(self):
+        backend = FakeBackend('b1')
+        call = BackendsCall([backend], 'iter_things', 100, pool=self.pool)
+        it = iter(call)
+        self.assertEqual(next(it), 0)
+        # Let the backend fill its buffer.
+        while call.responses.qsize() < call.BUFFER_SIZE - 1:
+            Event().wait(0.01)
+        Event().wait(0.1)
+        self.assertLessEqual(call.responses.qsize(), call.BUFFER_SIZE)
+        self.assertEqual(list(it), list(range(1, 100)))
+
+    def test_stop_closes_iterator(self):
+        closed = Event()
+
+        def iter_forever(backend):
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.set()
+
+        call = BackendsCall([FakeBackend('b1')], iter_forever, pool=self.pool)
+        for _ in call:
+            break
+        call.stop()
+        self.assertTrue(closed.wait(5))
+
+    def test_nested_call(self):
+        # Looking up objects of a backend while iterating on its results
+        # must not wait for the buffer of the first call.
+        backend = FakeBackend('b1')
+
+        def run():
+            return [list(BackendsCall([backend], 'get_thing', i, pool=self.pool))
+                    for i in BackendsCall([backend], 'iter_things', 30, pool=self.pool)]
+
+        self.assertEqual(self.run_in_thread(run), [[i] for i in range(30)])
+
+    def test_batch_backend(self):
+        def iter_batches(backend):
+            return TransactionBatch.chunks([Transaction(), Transaction()], size=1)
+
+        batches = list(BackendsCall([FakeBackend('b1')], iter_batches, pool=self.pool))
+        self.assertEqual([batch.backend for batch in batches], ['b1', 'b1'])
+        self.assertEqual([tr.backend for batch in batches for tr in batch], ['b1', 'b1'])
+
+    def test_unblock_backend(self):
+        backend = FakeBackend('b1')
+
+        def run():
+            things = []
+            for i in BackendsCall([backend], 'iter_things', 30, pool=self.pool):
+                BackendsCall.unblock_backend(backend)
+                with backend:
+                    things.append(i)
+            return things
+
+        self.assertEqual(self.run_in_thread(run), list(range(30)))
+
+
+class DeadlineTest(TestCase):
+    def setUp(self):
+        self.pool = BackendsPool()
+        self.release = Event()
+        self.backends = [FakeBackend('b1'), FakeBackend('b2')]
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    def run_late(self, backend):
+        if backend.name == 'b2':
+            self.release.wait(5)
+        return backend.name
+
+    def assertTimeout(self, errors):
+        (backend, error, _), = errors
+        self.assertIs(backend, self.backends[1])
+        self.assertIsInstance(error, CallTimeout)
+
+    def test_iter(self):
+        results = []
+        call = BackendsCall(self.backends, self.run_late, pool=self.pool, deadline=0.2)
+        with self.assertRaises(CallErrors) as cm:
+            for result in call:
+                results.append(result)
+        # Results of other backends are not held by the late one.
+        self.assertEqual(results, ['b1'])
+        self.assertTimeout(cm.exception)
+
+    def test_wait(self):
+        call = BackendsCall(self.backends, self.run_late, pool=self.pool, deadline=0.2)
+        with self.assertRaises(CallErrors) as cm:
+            call.wait()
+        self.assertTimeout(cm.exception)
+
+    def test_time_left(self):
+        # Requests done by backends are timed out according to the deadline.
+        class Result(object):
+            def __init__(self):
+                self.time_left = get_time_left()
+
+        result, = BackendsCall(self.backends[:1], lambda backend: Result(), pool=self.pool, deadline=10)
+        self.assertTrue(0 < result.time_left <= 10)
+        result, = BackendsCall(self.backends[:1], lambda backend: Result(), pool=self.pool)
+        self.assertIsNone(result.time_left)
+
+    def test_browser(self):
+        browser = Browser()
+        with deadline_scope(time() - 1):
+            self.assertRaises(requests.exceptions.Timeout, browser.open, 'http://localhost/')
+
+
+class PoolTest(TestCase):
+    def setUp(self):
+        self.pool = BackendsPool(max_workers=2)
+
+    def tearDown(self):
+        self.pool.shutdown(wait=False)
+
+    def test_reuse(self):
+        backends = [FakeBackend('b%d' % i) for i in range(4)]
+        threads = set()
+        for _ in range(5):
+            call = BackendsCall(backends, 'get_thread', pool=self.pool)
+            threads.update(call)
+        # Threads are started on demand and reused by the next calls.
+        self.assertLessEqual(len(threads), 2)
+        self.assertEqual(len(self.pool.workers), len(threads))
+
+    def test_module_limit(self):
+        self.pool.set_module_limit(FakeBackend.NAME, 1)
+        release = Event()
+        started = []
+
+        def run(backend):
+            started.append(backend.name)
+            release.wait(5)
+
+        call = BackendsCall([FakeBackend('b1'), FakeBackend('b2')], run, pool=self.pool)
+        self.assertFalse(release.wait(0.1))
+        self.assertEqual(len(started), 1)
+        release.set()
+        call.wait()
+        self.assertEqual(sorted(started), ['b1', 'b2'])
+
+    def test_nested_call(self):
+        # Every worker runs a backend waiting for the consumer, which calls
+        # another backend while iterating.
+        backends = [FakeBackend('b%d' % i) for i in range(3)]
+        other = FakeBackend('other')
+
+        def run():
+            results = []
+            for i in BackendsCall(backends, 'iter_things', 50, pool=self.pool):
+                results.extend(BackendsCall([other], 'get_thing', i, pool=self.pool))
+            return results
+
+        for limit in (None, 1):
+            self.pool.set_module_limit(FakeBackend.NAME, limit)
+            results = []
+            thread = Thread(target=lambda: results.extend(run()))
+            thread.daemon = True
+            thread.start()
+            thread.join(10)
+            self.assertFalse(thread.is_alive(), 'call is blocked')
+            self.assertEqual(sorted(results), sorted(list(range(50)) * 3))
+
+    def test_shutdown(self):
+        call = BackendsCall([FakeBackend('b1')], 'get_thread', pool=self.pool)
+        thread, = call
+        self.pool.shutdown()
+        self.assertFalse(thread.is_alive())
+        self.assertRaises(RuntimeError, self.pool.submit, FakeBackend('b1'), lambda: None)
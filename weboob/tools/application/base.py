@@ -294,21 +294,27 @@ class Application(object):
     def _do_complete_iter(self, backend, count, fields, res):
         modif = 0
 
-        for i, sub in enumerate(res):
-            sub = self._do_complete_obj(backend, fields, sub)
-            if self.condition and self.condition.limit and \
-               self.condition.limit == i:
-                return
-
-            if self.condition and not self.condition.is_valid(sub):
-                modif += 1
-            else:
-                if count and i - modif == count:
-                    if self._is_default_count:
-                        raise MoreResultsAvailable()
-                    else:
-                        return
-                yield sub
+        try:
+            for i, sub in enumerate(res):
+                sub = self._do_complete_obj(backend, fields, sub)
+                if self.condition and self.condition.limit and \
+                   self.condition.limit == i:
+                    return
+
+                if self.condition and not self.condition.is_valid(sub):
+                    modif += 1
+                else:
+                    if count and i - modif == count:
+                        if self._is_default_count:
+                            raise MoreResultsAvailable()
+                        else:
+                            return
+                    yield sub
+        finally:
+            # Stop the backend iterator (and its pagination) right away
+            # once we have enough results.
+            if hasattr(res, 'close'):
+                res.close()
 
     def _do_complete(self, backend, count, selected_fields, function, *args, **kwargs):
         assert count is None or count > 0
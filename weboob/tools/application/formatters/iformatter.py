@@ -165,12 +165,15 @@ class IFormatter(object):
         An object has fields which can be selected.
 
         :param obj: object to format
-        :type obj: BaseObject or dict
+        :type obj: BaseObject or dict, or a batch of objects (see :meth:`format_batch`)
         :param selected_fields: fields to display. If None, all fields are selected
         :type selected_fields: tuple
         :param alias: an alias to use instead of the object's ID
         :type alias: unicode
         """
+        if not isinstance(obj, (BaseObject, dict)) and hasattr(obj, 'iter_dicts'):
+            return self.format_batch(obj, selected_fields)
+
         if isinstance(obj, BaseObject):
             if selected_fields:  # can be an empty list (nothing to do), or None (return all fields)
                 obj = obj.copy()
@@ -192,7 +195,7 @@ class IFormatter(object):
 
             if selected_fields:
                 obj = obj.copy()
-                for name, value in obj.items():
+                for name in list(obj):
                     if name not in selected_fields:
                         obj.pop(name)
 
@@ -207,6 +210,25 @@ class IFormatter(object):
             self.output(formatted)
         return formatted
 
+    def format_batch(self, batch, selected_fields=None):
+        """
+        Format each object of a batch, for example a
+        :class:`weboob.capabilities.bank.TransactionBatch`.
+        Called by format() for objects with an `iter_dicts()` method.
+
+        Formatters of dicts get the rows as dicts, without building an
+        object for each row.
+
+        :param batch: objects to format
+        :type batch: iter[:class:`BaseObject`]
+        :rtype: list[str]
+        """
+        if type(self).format_obj == IFormatter.format_obj:
+            rows = batch.iter_dicts()
+        else:
+            rows = batch
+        return [self.format(row, selected_fields) for row in rows]
+
     def format_obj(self, obj, alias=None):
         """
         Format an object to be human-readable.
@@ -273,7 +295,7 @@ class PrettyFormatter(IFormatter):
         return None
 
 
-def formatter_test_output(Formatter, obj):
+def formatter_test_output(Formatter, obj, selected_fields=None):
     """
     Formats an object and returns output as a string.
     For test purposes only.
@@ -283,7 +305,7 @@ def formatter_test_output(Formatter, obj):
     _, name = mkstemp()
     fmt = Formatter()
     fmt.outfile = name
-    fmt.format(obj)
+    fmt.format(obj, selected_fields)
     fmt.flush()
     with open(name) as f:
         res = f.read()
@@ -58,3 +58,11 @@ def test():
     from .iformatter import formatter_test_output as fmt
     assert fmt(JsonFormatter, {'foo': 'bar'}) == '[{"foo": "bar"}]\n'
     assert fmt(JsonLineFormatter, {'foo': 'bar'}) == '{"foo": "bar"}\n'
+    assert fmt(JsonLineFormatter, {'foo': 'bar', 'baz': 1}, ('foo',)) == '{"foo": "bar"}\n'
+
+    import datetime
+    from weboob.capabilities.bank import TransactionBatch
+    batch = TransactionBatch()
+    batch.add(date=datetime.date(2020, 1, 1), raw=u'SHOP')
+    batch.add(date=datetime.date(2020, 1, 2), raw=u'RENT')
+    assert fmt(JsonLineFormatter, batch, ('raw',)) == '{"raw": "SHOP"}\n{"raw": "RENT"}\n'
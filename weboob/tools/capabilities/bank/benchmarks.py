@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmarks of the bank objects and tools.
+
+They are not run with the tests. To run them all, or only some of them:
+
+    $ python -m weboob.tools.capabilities.bank.benchmarks [name ...]
+"""
+
+from __future__ import print_function
+
+import datetime
+import sys
+from decimal import Decimal
+from timeit import default_timer
+
+from weboob.capabilities.bank import Transaction
+from weboob.capabilities.messages import Message
+from weboob.tools.capabilities.bank.transactions import iter_sorted_transactions, merge_iterators, sorted_transactions
+
+
+def timeit(func, number):
+    start = default_timer()
+    for _ in range(number):
+        func()
+    return (default_timer() - start) / number
+
+
+def bench_transaction_setattr(number=10000):
+    tr = Transaction()
+    message = Message()
+    values = [('date', datetime.date(2020, 1, 1)), ('raw', u'CB CARREFOUR'), ('label', u'CARREFOUR'),
+              ('amount', Decimal('-12.5')), ('type', Transaction.TYPE_CARD), ('_extra', None)]
+
+    def run():
+        for name, value in values:
+            setattr(tr, name, value)
+        # A field declared with a type name.
+        message.parent = message
+
+    return 'BaseObject.__setattr__', timeit(run, number) / (len(values) + 1)
+
+
+def bench_unique_ids(number=5, count=5000):
+    transactions = []
+    for i in range(count):
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, 1) + datetime.timedelta(days=i % 365)
+        tr.raw = u'CB  CARREFOUR %d' % (i % 100)
+        tr.amount = Decimal(i % 50)
+        transactions.append(tr)
+
+    def run():
+        Transaction.unique_ids(transactions, seen=set(), account_id=u'1234')
+
+    return 'Transaction.unique_ids', timeit(run, number), count
+
+
+def make_transactions(count):
+    transactions = []
+    for i in range(count):
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, 1) + datetime.timedelta(days=(i * 7919) % 3650)
+        tr.rdate = tr.date
+        tr.raw = u'CB CARREFOUR %d' % i
+        tr.amount = Decimal(i % 50)
+        transactions.append(tr)
+    return transactions
+
+
+def bench_merge_iterators(number=5, sources=20, count=1000):
+    histories = [sorted_transactions(make_transactions(count)) for _ in range(sources)]
+
+    def run():
+        for _ in merge_iterators(*[iter(history) for history in histories]):
+            pass
+
+    return 'merge_iterators', timeit(run, number), sources * count
+
+
+def bench_iter_sorted_transactions(number=3, count=50000):
+    transactions = make_transactions(count)
+
+    def run():
+        for _ in iter_sorted_transactions(transactions, chunk_size=10000):
+            pass
+
+    return 'iter_sorted_transactions', timeit(run, number), count
+
+
+BENCHMARKS = [bench_transaction_setattr, bench_unique_ids, bench_merge_iterators, bench_iter_sorted_transactions]
+
+
+def main(names):
+    for bench in BENCHMARKS:
+        if names and bench.__name__[len('bench_'):] not in names:
+            continue
+        result = bench()
+        label, duration = result[:2]
+        line = '%-30s %10.2f µs' % (label, duration * 1e6)
+        if len(result) > 2:
+            # Number of items handled by each run.
+            line += '  %10d items/s' % (result[2] / duration)
+        print(line)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Lock
+import sqlite3
+
+from weboob.capabilities.bank import Transaction, TransactionBatch
+from weboob.tools.compat import unicode
+
+
+__all__ = ['TransactionIndex']
+
+
+class TransactionIndex(object):
+    """
+    Unique IDs of the transactions already synchronized, for each account,
+    saved in a SQLite database.
+
+    It is used to skip known transactions on incremental synchronizations,
+    before they are stored or even built as objects:
+
+    >>> index = TransactionIndex('/tmp/weboob-transactions.sqlite') # doctest: +SKIP
+    >>> new = index.filter_new(account.id, batch, add=True) # doctest: +SKIP
+
+    Unique IDs depend on the transactions seen before them (see
+    :meth:`weboob.capabilities.bank.Transaction.unique_id`), so they must be
+    computed over the whole history of an account on each synchronization,
+    which :meth:`filter_new` does.
+    """
+
+    # Maximum number of variables of a SQLite query.
+    CHUNK_SIZE = 500
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.lock = Lock()
+        self.storage = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.storage.execute('PRAGMA journal_mode = WAL')
+        self.storage.execute('''CREATE TABLE IF NOT EXISTS transactions (
+            account_id text,
+            unique_id text,
+            PRIMARY KEY (account_id, unique_id)
+        ) WITHOUT ROWID;''')
+
+    def _chunks(self, unique_ids):
+        unique_ids = list(unique_ids)
+        for i in range(0, len(unique_ids), self.CHUNK_SIZE):
+            yield unique_ids[i:i + self.CHUNK_SIZE]
+
+    def known(self, account_id, unique_ids):
+        """
+        Get the unique IDs which are already in the index.
+
+        :rtype: :class:`set`
+        """
+        account_id = unicode(account_id)
+        found = set()
+        with self.lock:
+            for chunk in self._chunks(unique_ids):
+                cur = self.storage.execute('SELECT unique_id FROM transactions WHERE account_id=? AND unique_id IN (%s);'
+                                           % ', '.join('?' * len(chunk)), [account_id] + chunk)
+                found.update(row[0] for row in cur)
+        return found
+
+    def __contains__(self, key):
+        account_id, unique_id = key
+        return bool(self.known(account_id, [unique_id]))
+
+    def add(self, account_id, unique_ids):
+        """
+        Add unique IDs of transactions to the index.
+        """
+        account_id = unicode(account_id)
+        with self.lock:
+            self.storage.execute('BEGIN IMMEDIATE;')
+            try:
+                for chunk in self._chunks(unique_ids):
+                    self.storage.executemany('INSERT OR IGNORE INTO transactions VALUES (?, ?);',
+                                             [(account_id, unique_id) for unique_id in chunk])
+            except BaseException:
+                self.storage.execute('ROLLBACK;')
+                raise
+            else:
+                self.storage.execute('COMMIT;')
+
+    def filter_new(self, account_id, transactions, seen=None, add=False):
+        """
+        Get the transactions which are not in the index.
+
+        Unique IDs are computed with `seen` as
+        :meth:`weboob.capabilities.bank.Transaction.unique_id` parameter,
+        without `account_id` as the index is already split by account.
+
+        :param transactions: whole history of the account to filter
+        :type transactions: :class:`weboob.capabilities.bank.TransactionBatch` or list[:class:`weboob.capabilities.bank.Transaction`]
+        :param seen: set of the unique IDs already computed, a new one by default
+        :type seen: :class:`set`
+        :param add: add the unique IDs of the new transactions to the index
+        :type add: :class:`bool`
+        :returns: a new batch for a batch, a list otherwise
+        """
+        if seen is None:
+            seen = set()
+
+        if isinstance(transactions, TransactionBatch):
+            unique_ids = transactions.unique_ids(seen)
+        else:
+            transactions = list(transactions)
+            unique_ids = Transaction.unique_ids(transactions, seen)
+
+        known = self.known(account_id, unique_ids)
+        indexes = [i for i, unique_id in enumerate(unique_ids) if unique_id not in known]
+
+        if add:
+            self.add(account_id, [unique_ids[i] for i in indexes])
+
+        if isinstance(transactions, TransactionBatch):
+            return transactions.take(indexes)
+        return [transactions[i] for i in indexes]
+
+    def remove(self, account_id):
+        """
+        Forget all transactions of an account.
+        """
+        with self.lock:
+            self.storage.execute('DELETE FROM transactions WHERE account_id=?;', (unicode(account_id),))
+
+    def close(self):
+        with self.lock:
+            self.storage.close()
+
+
+def test_index():
+    import datetime
+    import os
+    import shutil
+    import tempfile
+    from decimal import Decimal
+
+    transactions = []
+    for i, raw in enumerate([u'CB  SHOP', u'SALARY', u'CB SHOP', u'RENT']):
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, i + 1)
+        tr.raw = raw
+        tr.amount = Decimal(i)
+        transactions.append(tr)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        index = TransactionIndex(os.path.join(tmpdir, 'index.sqlite'))
+        index.add('1', Transaction.unique_ids(transactions[:2], seen=set()))
+        assert ('1', transactions[0].unique_id(seen=set())) in index
+        assert ('2', transactions[0].unique_id(seen=set())) not in index
+
+        new = index.filter_new('1', transactions, seen=set())
+        assert [tr.raw for tr in new] == [u'CB SHOP', u'RENT']
+
+        batch, = TransactionBatch.chunks(transactions)
+        new = index.filter_new('1', batch, seen=set())
+        assert isinstance(new, TransactionBatch)
+        assert [tr.raw for tr in new] == [u'CB SHOP', u'RENT']
+        assert len(index.filter_new('2', batch, seen=set())) == 4
+
+        index.remove('1')
+        assert len(index.filter_new('1', batch, seen=set())) == 4
+
+        # Two identical transactions of the same day are both imported, and
+        # only the third one is new on the next synchronization.
+        shop = transactions[2]
+        new = index.filter_new('3', [shop, shop, transactions[3]], add=True)
+        assert new == [shop, shop, transactions[3]]
+        assert index.filter_new('3', [shop, shop, transactions[3]], add=True) == []
+        new = index.filter_new('3', [shop, shop, shop, transactions[3]], add=True)
+        assert new == [shop]
+
+        batch, = TransactionBatch.chunks([shop, shop])
+        assert len(index.filter_new('4', batch, add=True)) == 2
+        batch, = TransactionBatch.chunks([shop, shop, shop])
+        new = index.filter_new('4', batch, add=True)
+        assert [tr.raw for tr in new] == [u'CB SHOP']
+        assert not index.filter_new('4', batch)
+        index.close()
+    finally:
+        shutil.rmtree(tmpdir)
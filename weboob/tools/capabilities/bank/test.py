@@ -20,7 +20,7 @@
 from datetime import date
 
 from weboob.capabilities.base import empty, NotLoaded
-from weboob.capabilities.bank import CapBankTransfer, CapBankWealth
+from weboob.capabilities.bank import CapBankTransfer, CapBankWealth, TransactionBatch
 from weboob.exceptions import NoAccountsException
 from weboob.tools.capabilities.bank.iban import is_iban_valid
 from weboob.tools.capabilities.bank.investments import is_isin_valid
@@ -106,12 +106,20 @@ class BankStandardTest(object):
             else:
                 self.assertEqual(account.parent.type, account.TYPE_CHECKING, 'parent account of %r should have checking type' % account)
 
+    def iter_transactions(self, transactions):
+        for tr in transactions:
+            if isinstance(tr, TransactionBatch):
+                for row in tr:
+                    yield row
+            else:
+                yield tr
+
     def check_history(self, account):
-        for tr in self.backend.iter_history(account):
+        for tr in self.iter_transactions(self.backend.iter_history(account)):
             self.check_transaction(account, tr, False)
 
     def check_coming(self, account):
-        for tr in self.backend.iter_coming(account):
+        for tr in self.iter_transactions(self.backend.iter_coming(account)):
             self.check_transaction(account, tr, True)
 
     def check_transaction(self, account, tr, coming):
@@ -17,12 +17,15 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import OrderedDict
+from itertools import islice
+from tempfile import TemporaryFile
+import heapq
+import pickle
 from decimal import Decimal, InvalidOperation
 import datetime
 import re
 
-from weboob.capabilities.bank import Transaction, Account
+from weboob.capabilities.bank import Transaction, TransactionBatch, Account
 from weboob.capabilities import NotAvailable, NotLoaded
 from weboob.tools.misc import to_unicode
 from weboob.tools.log import getLogger
@@ -308,35 +311,154 @@ class AmericanTransaction(Transaction):
         return Decimal(amnt) if amnt else Decimal('0')
 
 
+def _sort_key(tr):
+    return (tr.date, new_datetime(tr.rdate) if tr.rdate else datetime.datetime.min)
+
+
 def sorted_transactions(iterable):
-    """Sort an iterable of transactions in reverse chronological order"""
-    return sorted(iterable, reverse=True, key=lambda tr: (tr.date, new_datetime(tr.rdate) if tr.rdate else datetime.datetime.min))
+    """Sort an iterable of transactions in reverse chronological order
+
+    A :class:`weboob.capabilities.bank.TransactionBatch` is sorted by columns,
+    and a new batch is returned.
+
+    The whole iterable is kept in memory, see :func:`iter_sorted_transactions`
+    for very long histories.
+    """
+    if isinstance(iterable, TransactionBatch):
+        return iterable.sorted()
+    return sorted(iterable, reverse=True, key=_sort_key)
+
+
+def iter_sorted_transactions(iterable, chunk_size=10000, tmpdir=None):
+    """Sort an iterable of transactions in reverse chronological order,
+    without keeping all of them in memory.
+
+    Transactions are sorted by chunks of `chunk_size` items, which are saved
+    in temporary files and merged while the result is iterated. The order is
+    the same as :func:`sorted_transactions`.
+
+    Temporary files are removed once the iteration is over, or when the
+    iterator is closed to stop it early.
+
+    :param chunk_size: maximum number of transactions kept in memory to be sorted
+    :type chunk_size: int
+    :param tmpdir: directory of temporary files, the system one by default
+    :type tmpdir: str
+    :rtype: iter[:class:`weboob.capabilities.bank.Transaction`]
+    """
+    runs = []
+    try:
+        it = iter(iterable)
+        while True:
+            chunk = sorted(islice(it, chunk_size), reverse=True, key=_sort_key)
+            if not runs and len(chunk) < chunk_size:
+                # Everything fits in memory.
+                for tr in chunk:
+                    yield tr
+                return
+            if not chunk:
+                break
+            runs.append(_spill(chunk, tmpdir))
+            del chunk
+
+        for tr in _heap_merge([_iter_spilled(run) for run in runs], _sort_key):
+            yield tr
+    finally:
+        for run in runs:
+            run.close()
+
+
+# Number of transactions pickled together in spilled chunks.
+_SPILL_BLOCK_SIZE = 256
+
+
+def _spill(transactions, tmpdir=None):
+    f = TemporaryFile(dir=tmpdir)
+    try:
+        for i in range(0, len(transactions), _SPILL_BLOCK_SIZE):
+            pickle.dump(transactions[i:i + _SPILL_BLOCK_SIZE], f, pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _iter_spilled(f):
+    while True:
+        try:
+            block = pickle.load(f)
+        except EOFError:
+            return
+        for tr in block:
+            yield tr
 
 
 def merge_iterators(*iterables):
     """Merge transactions iterators keeping sort order.
 
     Each iterator must already be sorted in reverse chronological order.
+    Transactions of the same date are taken from iterators in the order
+    they are given.
+
+    If all of them are :class:`weboob.capabilities.bank.TransactionBatch`
+    objects, they are merged by columns into a new batch.
     """
+    if iterables and all(isinstance(it, TransactionBatch) for it in iterables):
+        return TransactionBatch.merge(*iterables)
+    return _heap_merge(iterables, lambda tr: (tr.date, tr.rdate))
 
-    def keyfunc(kv):
-        return (kv[1].date, kv[1].rdate)
 
-    its = OrderedDict((iter(it), None) for it in iterables)
-    for k in list(its):
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
+class _ReversedKey(object):
+    """
+    Sort key inverting the order of the wrapped one, to use :mod:`heapq`
+    as a max-heap.
+    """
 
-    while its:
-        k, v = max(its.items(), key=keyfunc)
-        yield v
+    __slots__ = ('key',)
 
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _heap_merge(iterables, key):
+    """
+    Merge iterables sorted in descending order of `key`.
+
+    On equal keys, items are taken from iterables in the order they are
+    given.
+    """
+    heap = []
+    for index, it in enumerate(iterables):
+        it = iter(it)
+        for value in it:
+            heap.append([_ReversedKey(key(value)), index, value, it])
+            break
+    heapq.heapify(heap)
+
+    while len(heap) > 1:
+        entry = heap[0]
+        yield entry[2]
+
+        for value in entry[3]:
+            entry[0] = _ReversedKey(key(value))
+            entry[2] = value
+            heapq.heapreplace(heap, entry)
+            break
+        else:
+            heapq.heappop(heap)
+
+    if heap:
+        _, _, value, it = heap[0]
+        yield value
+        for value in it:
+            yield value
 
 
 def keep_only_card_transactions(it, match_func=None):
@@ -390,3 +512,97 @@ def test():
     decimal_amount = AmericanTransaction.decimal_amount
     assert decimal_amount('$12,442.12 USD') == Decimal('12442.12')
     assert decimal_amount('') == Decimal('0')
+
+
+def test_batch():
+    transactions = []
+    for i, (day, raw) in enumerate([(3, u'CB  SHOP'), (1, u'SALARY'), (3, u'CB SHOP'), (2, u'RENT')]):
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, day)
+        tr.rdate = tr.date
+        tr.raw = raw
+        tr.amount = Decimal(i)
+        transactions.append(tr)
+
+    batch, = TransactionBatch.chunks(transactions)
+    assert len(batch) == 4
+    assert [tr.raw for tr in batch] == [tr.raw for tr in transactions]
+    assert [tr.raw for tr in sorted_transactions(batch)] == [tr.raw for tr in sorted_transactions(transactions)]
+    seen = set()
+    assert batch.unique_ids(seen=set()) == [tr.unique_id(seen=seen) for tr in transactions]
+
+    first, second = TransactionBatch.chunks(sorted_transactions(transactions), size=2)
+    merged = merge_iterators(second, first)
+    assert [tr.raw for tr in merged] == [tr.raw for tr in merge_iterators(list(second), list(first))]
+    assert [row['raw'] for row in merged[:2].iter_dicts()] == [u'CB  SHOP', u'CB SHOP']
+
+
+def test_merge():
+    transactions = []
+    for i, day in enumerate([3, 1, 3, 2, 2, 1]):
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, day)
+        tr.rdate = tr.date
+        tr.raw = u'%d' % i
+        transactions.append(tr)
+
+    first = sorted_transactions(transactions[:3])
+    second = sorted_transactions(transactions[3:])
+    # Equal dates are taken from the first iterator first.
+    assert [tr.raw for tr in merge_iterators(iter(first), [], iter(second))] == ['0', '2', '3', '4', '1', '5']
+    assert list(merge_iterators()) == []
+
+    expected = [tr.raw for tr in sorted_transactions(transactions)]
+    for chunk_size in (1, 2, 6, 10):
+        assert [tr.raw for tr in iter_sorted_transactions(iter(transactions), chunk_size=chunk_size)] == expected
+
+    tr = next(iter_sorted_transactions(transactions, chunk_size=1))
+    assert tr.label is NotLoaded
+
+
+def test_sorted_stop():
+    import os
+    import shutil
+    import tempfile
+
+    transactions = []
+    for day in [3, 1, 2, 2]:
+        tr = Transaction()
+        tr.date = datetime.date(2020, 1, day)
+        tr.rdate = tr.date
+        transactions.append(tr)
+
+    def spilled(files):
+        return [f for f in files if not f.closed]
+
+    # Temporary files are anonymous, keep them to check they are closed.
+    global TemporaryFile
+    orig_tempfile = TemporaryFile
+    files = []
+
+    def tracked_tempfile(**kwargs):
+        f = orig_tempfile(**kwargs)
+        files.append(f)
+        return f
+
+    TemporaryFile = tracked_tempfile
+    tmpdir = tempfile.mkdtemp()
+    try:
+        it = iter_sorted_transactions(transactions, chunk_size=1, tmpdir=tmpdir)
+        for tr in it:
+            break
+        assert len(spilled(files)) == 4
+        it.close()
+        assert spilled(files) == []
+
+        # Files are also closed when the iterator is dropped.
+        for tr in iter_sorted_transactions(transactions, chunk_size=1, tmpdir=tmpdir):
+            break
+        assert spilled(files) == []
+
+        list(iter_sorted_transactions(transactions, chunk_size=1, tmpdir=tmpdir))
+        assert spilled(files) == []
+        assert os.listdir(tmpdir) == []
+    finally:
+        TemporaryFile = orig_tempfile
+        shutil.rmtree(tmpdir)
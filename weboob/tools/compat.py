@@ -27,6 +27,7 @@ __all__ = ['unicode', 'long', 'basestring', 'range',
            'urlparse', 'urlunparse', 'urlsplit', 'urlunsplit',
            'urlencode', 'urljoin', 'parse_qs', 'parse_qsl',
            'getproxies', 'fullmatch',
+           'Mapping', 'MutableMapping',
            ]
 
 
@@ -52,6 +53,12 @@ except NameError:
     range = range
 
 
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
+
+
 try:
     from future.utils import with_metaclass
 except ImportError:
@@ -23,7 +23,7 @@ from __future__ import absolute_import
 from decimal import Decimal
 from datetime import datetime, date, time, timedelta
 
-__all__ = ['json', 'mini_jsonpath']
+__all__ = ['json', 'loads', 'mini_jsonpath']
 
 try:
     # try simplejson first because it is faster
@@ -35,10 +35,42 @@ except ImportError:
     # Python 2.6+ has a module similar to simplejson
     import json
 
+try:
+    # orjson and ujson are much faster to decode documents, but they are
+    # only used by loads(), as they lack most options of the json module.
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = None
+
 from weboob.capabilities.base import BaseObject, NotAvailable, NotLoaded
 from weboob.tools.compat import basestring
 
 
+def loads(data):
+    """
+    Decode a JSON document with the fastest available library.
+
+    Bytes are decoded as UTF-8, and invalid sequences are replaced.
+
+    >>> loads(b'{"a": [1, 2.5, null]}') == {'a': [1, 2.5, None]}
+    True
+    """
+    if fast_json is not None:
+        try:
+            return fast_json.loads(data)
+        except (ValueError, OverflowError):
+            # Let the json module decode what the other ones do not support,
+            # like big integers, or raise its usual errors.
+            pass
+
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', 'replace')
+    return json.loads(data)
+
+
 def mini_jsonpath(node, path):
     """
     Evaluates a dot separated path against JSON data. Path can contains
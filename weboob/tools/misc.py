@@ -18,6 +18,8 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from contextlib import contextmanager
+from threading import local
 from time import time, sleep
 import locale
 import os
@@ -29,7 +31,8 @@ from .compat import unicode
 
 
 __all__ = ['get_backtrace', 'get_bytes_size', 'iter_fields',
-           'to_unicode', 'input', 'limit', 'find_exe']
+           'to_unicode', 'input', 'limit', 'find_exe',
+           'deadline_scope', 'get_time_left']
 
 
 def get_backtrace(empty="Empty backtrace."):
@@ -177,6 +180,48 @@ def ratelimit(group, delay):
     os.utime(path, None)
 
 
+_deadline_local = local()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """
+    Set a deadline for the code run by the current thread in this context.
+
+    Nested scopes can only make the deadline earlier. Code doing blocking
+    calls, like :meth:`weboob.browser.browsers.Browser.open`, uses
+    :func:`get_time_left` to limit its timeouts.
+
+    @param deadline [float]  timestamp as returned by time.time(), or None
+    """
+    previous = getattr(_deadline_local, 'deadline', None)
+    if deadline is None or (previous is not None and previous < deadline):
+        deadline = previous
+
+    _deadline_local.deadline = deadline
+    try:
+        yield
+    finally:
+        _deadline_local.deadline = previous
+
+
+def get_time_left():
+    """
+    Get the number of seconds left before the deadline of the current thread,
+    or None if there is no deadline.
+
+    >>> get_time_left() is None
+    True
+    >>> with deadline_scope(time() + 60):
+    ...     0 < get_time_left() <= 60
+    True
+    """
+    deadline = getattr(_deadline_local, 'deadline', None)
+    if deadline is None:
+        return None
+    return max(0, deadline - time())
+
+
 def find_exe(basename):
     """
     Find the path to an executable by its base name (such as 'gpg').